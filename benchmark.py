@@ -0,0 +1,222 @@
+"""
+Benchmarks of every pipeline stage, with scaling over table size, station count and number of
+reservoir conditions. Results are written as JSON so runs from different commits can be compared.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+THERMO_DATA = 'data/output.dat'
+AREA_DATA = 'data/area.dat'
+
+# Default scaling parameters (--quick uses the smaller lists)
+TABLE_FRACTIONS = (0.1, 0.25, 0.5, 1.0)
+STATIONS = (100, 500, 2000, 10000)
+RESERVOIRS = (1, 10, 100, 1000)
+QUICK = {'table_fractions': (0.1, 0.25), 'stations': (100, 500), 'reservoirs': (1, 100)}
+
+P0_RANGE = (1e6, 1e7)  # Reservoir pressures (Pa) of the benchmark cases
+T0_RANGE = (3000, 4500)  # Reservoir temperatures (K) of the benchmark cases
+
+
+def measure(func, repeat, setup=None):
+    """
+    Times func() 'repeat' times (after setup(), which is not timed) and returns the best and median seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': float(np.median(times)), 'repeat': repeat}
+
+
+def subsample_table(df, fraction):
+    """
+    Keeps every k-th pressure level of the table (all temperatures), so the (T, p) grid stays a tensor grid.
+    """
+    levels = np.unique(df['p'].values)
+    keep = levels[::max(1, int(round(1 / fraction)))]
+    return pd.DataFrame({name: df[name].values for name in df.columns})[np.isin(df['p'].values, keep)] \
+        .reset_index(drop=True)
+
+
+def resample_area(Area, stations):
+    """
+    Area profile with 'stations' evenly spaced rows (linear interpolation of the original profile).
+    """
+    x = np.linspace(Area['x'].values[0], Area['x'].values[-1], stations)
+    return pd.DataFrame({'x': x, 'A': np.interp(x, Area['x'].values, Area['A'].values)})
+
+
+def reservoir_conditions(n):
+    rng = np.random.default_rng(0)
+    return rng.uniform(*P0_RANGE, n), rng.uniform(*T0_RANGE, n)
+
+
+def run_benchmarks(table_fractions=TABLE_FRACTIONS, stations=STATIONS, reservoirs=RESERVOIRS, repeat=3,
+                   plots=True, log=print):
+    """
+    Runs every benchmark and returns the list of results.
+
+    Each result is {'stage', 'params', 'best', 'median', 'repeat'} with times in seconds.
+    """
+    from thermo import load_thermodynamic_data, construct_thermo_surrogate
+    from nozzle_area import find_astar, find_closest_index, load_area_data
+    from reservoir import create_reservoir_interpolator, get_reservoir_h_and_s
+    from sonic import compute_hstar_sstar, compute_rho_star_astar_Fstar
+    from indirect_method import process_nozzle_indirect_method
+    from direct_method import process_nozzle_direct_method
+    from frozen import process_nozzle_perfect_gas
+    import nozzle
+    import write_to_csv
+
+    results = []
+
+    def record(stage, params, timing):
+        results.append({'stage': stage, 'params': params, **timing})
+        log(f'{stage:<22}{json.dumps(params):<40}{timing["best"]:10.4f} s')
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Table loading: text parse plus binary conversion (cold), then memory-mapped (warm)
+        cache = os.path.join(scratch, 'tables')
+        record('load_table', {'cache': 'cold'},
+               measure(lambda: load_thermodynamic_data(THERMO_DATA, cache), repeat,
+                       setup=lambda: shutil.rmtree(cache, ignore_errors=True)))
+        record('load_table', {'cache': 'warm'}, measure(lambda: load_thermodynamic_data(THERMO_DATA, cache), repeat))
+        record('load_table', {'cache': 'none'}, measure(lambda: load_thermodynamic_data(THERMO_DATA, None), repeat))
+        df = load_thermodynamic_data(THERMO_DATA)[0]
+        Area = load_area_data(AREA_DATA)
+
+        # Surrogate fitting (never cached here) against table size
+        for fraction in table_fractions:
+            table = subsample_table(df, fraction)
+            record('fit_surrogate', {'rows': len(table)},
+                   measure(lambda: construct_thermo_surrogate(table, cache_dir=None), 1 if fraction > 0.3 else repeat))
+        surrogate = construct_thermo_surrogate(df)
+
+        # Reservoir and sonic stages against number of reservoir conditions
+        for fraction in table_fractions:
+            table = subsample_table(df, fraction)
+            record('reservoir_setup', {'rows': len(table)}, measure(lambda: create_reservoir_interpolator(table), repeat))
+        interpolator = create_reservoir_interpolator(df)
+        for n in reservoirs:
+            p0, T0 = reservoir_conditions(n)
+            record('reservoir_lookup', {'reservoirs': n},
+                   measure(lambda: get_reservoir_h_and_s(p0, T0, interpolator), repeat))
+            h0, s0 = get_reservoir_h_and_s(p0, T0, interpolator)
+            record('sonic', {'reservoirs': n}, measure(
+                lambda: compute_rho_star_astar_Fstar(s0, compute_hstar_sstar(s0, h0, surrogate)[0], surrogate),
+                repeat))
+
+        # Nozzle stages against station count (one reservoir condition)
+        h0, s0 = get_reservoir_h_and_s(5e6, 4500, interpolator)
+        h_star, s_star = compute_hstar_sstar(s0, h0, surrogate)
+        a_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, surrogate)
+        gamma, R = nozzle.GAMMA_FROZEN, nozzle.R_FROZEN
+        for n in stations:
+            profile = resample_area(Area, n)
+            A_x = profile['A']
+            x_star, A_star = find_astar(profile)
+            index_star = find_closest_index(A_x, A_star)
+            record('indirect', {'stations': n}, measure(lambda: process_nozzle_indirect_method(
+                s0, h0, profile, A_x, A_star, F_rho_a_star, index_star, surrogate), repeat))
+            record('direct', {'stations': n}, measure(lambda: process_nozzle_direct_method(
+                s0, h0, profile, A_x, A_star, F_rho_a_star, index_star, h_star, surrogate), repeat))
+            record('frozen', {'stations': n}, measure(lambda: process_nozzle_perfect_gas(
+                gamma, R, 5e6, 4500, profile, A_x, A_star, index_star), repeat))
+
+            # Writing a result of that many rows
+            solution = process_nozzle_direct_method(s0, h0, profile, A_x, A_star, F_rho_a_star, index_star,
+                                                    h_star, surrogate)
+            columns = solution.columns(nozzle.OUTPUT_COLUMNS)
+            path = os.path.join(scratch, 'solution.dat')
+            record('write_text', {'rows': n},
+                   measure(lambda: write_to_csv.write_columns(path, columns, nozzle.OUTPUT_HEADERS), repeat))
+            record('write_binary', {'rows': n}, measure(
+                lambda: write_to_csv.write_binary(path + '.bin', columns, nozzle.OUTPUT_HEADERS), repeat))
+
+        # Plotting one solution (all panels plus the area)
+        if plots:
+            import plots as plotting
+            x_star, A_star = find_astar(Area)
+            index_star = find_closest_index(Area['A'], A_star)
+            lte = process_nozzle_indirect_method(s0, h0, Area, Area['A'], A_star, F_rho_a_star, index_star, surrogate)
+            frozen = process_nozzle_perfect_gas(gamma, R, 5e6, 4500, Area, Area['A'], A_star, index_star)
+            out_dir = os.path.join(scratch, 'graphs')
+            record('plots', {'panels': len(plotting.PANELS) + 1}, measure(lambda: plotting.render_solution(
+                lte, frozen, area=(Area['x'].values, Area['A'].values), out_dir=out_dir), repeat))
+
+    return results
+
+
+def environment():
+    """
+    Describes the machine, library versions and commit the benchmarks ran on.
+    """
+    import scipy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'scipy': scipy.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(results, baseline, file=sys.stdout):
+    """
+    Prints the ratio of every result's best time to the matching baseline result (> 1 is slower).
+    """
+    reference = {(entry['stage'], json.dumps(entry['params'], sort_keys=True)): entry['best']
+                 for entry in baseline['results']}
+    for entry in results:
+        key = (entry['stage'], json.dumps(entry['params'], sort_keys=True))
+        if key in reference:
+            print(f'{entry["stage"]:<22}{key[1]:<40}{entry["best"] / reference[key]:8.2f}x', file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every stage of the nozzle pipeline.')
+    parser.add_argument('--output', default='benchmark.json', help='JSON results file')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed repetitions per benchmark (best is reported)')
+    parser.add_argument('--quick', action='store_true', help='Smaller scaling sweeps')
+    parser.add_argument('--table-fractions', type=float, nargs='+', help='Fractions of output.dat to fit')
+    parser.add_argument('--stations', type=int, nargs='+', help='Station counts of the area profile')
+    parser.add_argument('--reservoirs', type=int, nargs='+', help='Numbers of reservoir conditions')
+    parser.add_argument('--no-plots', action='store_true', help='Skip the plotting benchmark')
+    parser.add_argument('--compare', help='Earlier JSON results to compare against')
+    args = parser.parse_args(argv)
+
+    defaults = QUICK if args.quick else {'table_fractions': TABLE_FRACTIONS, 'stations': STATIONS,
+                                         'reservoirs': RESERVOIRS}
+    results = run_benchmarks(args.table_fractions or defaults['table_fractions'],
+                             args.stations or defaults['stations'], args.reservoirs or defaults['reservoirs'],
+                             args.repeat, plots=not args.no_plots)
+    with open(args.output, 'w') as file:
+        json.dump({'environment': environment(), 'results': results}, file, indent=1)
+    print(f'Wrote {len(results)} results -> {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Directory where binary copies of the text tables are stored
+TABLE_CACHE_DIR = 'data/cache/tables'
+TABLE_VERSION = 1  # Bump when the on-disk layout changes
+
+
+def load_table(source, reader, columns, cache_dir=TABLE_CACHE_DIR):
+    """
+    Loads a text data table through its binary column cache.
+
+    On first load (or when the source file changed) the table is parsed with 'reader' and
+    converted; later loads memory-map the typed column files, so no parsing or copying happens.
+
+    Args:
+    - source: Path of the text table.
+    - reader: Function reading the text table into a DataFrame (the fallback parser).
+    - columns: Expected column names; a cache with a different schema is rebuilt.
+    - cache_dir: Directory holding the binary tables, or None to always parse the text.
+
+    Returns:
+    - DataFrame whose columns are read-only memory-mapped arrays (or the parsed DataFrame).
+    """
+    if cache_dir is None:
+        return reader(source)
+
+    target = _table_path(source, cache_dir)
+    schema = _read_schema(target)
+    if schema is not None and [column['name'] for column in schema['columns']] == list(columns) \
+            and _source_matches(source, target, schema):
+        try:
+            return _open_columns(target, schema)
+        except (OSError, ValueError):
+            pass  # Damaged cache, convert again below
+
+    df = reader(source)
+    try:
+        schema = convert_table(df, source, target)
+    except OSError:
+        return df  # Caching is best effort (read-only data directory, another process won, ...)
+    return _open_columns(target, schema)
+
+
+def convert_table(df, source, target):
+    """
+    Stores a parsed table as one typed .npy file per column plus a schema.json describing it.
+
+    Args:
+    - df: Parsed table.
+    - source: Path of the text table it was read from (its size, mtime and SHA-256 are recorded).
+    - target: Directory to write.
+
+    Returns:
+    - The schema dictionary.
+    """
+    stat = os.stat(source)
+    return write_columns(target, {name: df[name].values for name in df.columns},
+                         source={'path': os.path.abspath(source), 'size': stat.st_size,
+                                 'mtime_ns': stat.st_mtime_ns, 'sha256': _file_hash(source)})
+
+
+def write_columns(target, columns, source=None):
+    """
+    Writes named arrays as a binary table directory (one .npy file per column plus schema.json).
+    The directory is assembled next to 'target' and moved into place, so readers never see half a table.
+
+    Args:
+    - target: Directory to write (replaced if it exists).
+    - columns: Dictionary of equal-length 1D arrays, in column order.
+    - source: Description of the text file the table was converted from, or None.
+
+    Returns:
+    - The schema dictionary.
+    """
+    arrays = [np.ascontiguousarray(array) for array in columns.values()]
+    rows = len(arrays[0]) if arrays else 0
+    if any(array.ndim != 1 or len(array) != rows for array in arrays):
+        raise ValueError('binary table columns must be 1D arrays of equal length')
+    schema = {'version': TABLE_VERSION, 'rows': rows, 'columns': [], 'source': source}
+
+    target = os.path.abspath(target)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(target))
+    try:
+        for i, (name, array) in enumerate(zip(columns, arrays)):
+            file = f'{i}.npy'
+            np.save(os.path.join(staging, file), array)
+            schema['columns'].append({'name': name, 'dtype': array.dtype.str, 'file': file})
+        with open(os.path.join(staging, 'schema.json'), 'w') as file:
+            json.dump(schema, file, indent=1)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return schema
+
+
+def read_columns(target):
+    """
+    Opens a binary table directory written by write_columns as a DataFrame of memory-mapped columns.
+    """
+    schema = _read_schema(target)
+    if schema is None:
+        raise ValueError(f'{target} is not a binary table (or was written by another version)')
+    return _open_columns(target, schema)
+
+
+def _table_path(source, cache_dir):
+    # One directory per source file, named after it
+    source = os.path.abspath(source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(os.path.abspath(cache_dir), f'{stem}_{hashlib.sha256(source.encode()).hexdigest()[:12]}')
+
+
+def _read_schema(target):
+    try:
+        with open(os.path.join(target, 'schema.json')) as file:
+            schema = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return schema if schema.get('version') == TABLE_VERSION else None
+
+
+def _source_matches(source, target, schema):
+    # Fast path: unchanged size and modification time. Otherwise compare content hashes.
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return True  # Source removed: the binary copy is all we have
+    recorded = schema['source']
+    if recorded is None:
+        return False
+    if stat.st_size == recorded['size'] and stat.st_mtime_ns == recorded['mtime_ns']:
+        return True
+    if stat.st_size != recorded['size'] or _file_hash(source) != recorded['sha256']:
+        return False
+
+    # Same content with a new timestamp (e.g. a fresh checkout): refresh the stamp
+    recorded['mtime_ns'] = stat.st_mtime_ns
+    try:
+        with open(os.path.join(target, 'schema.json'), 'w') as file:
+            json.dump(schema, file, indent=1)
+    except OSError:
+        pass
+    return True
+
+
+def _open_columns(target, schema):
+    columns = {}
+    for column in schema['columns']:
+        array = np.load(os.path.join(target, column['file']), mmap_mode='r')
+        if array.dtype != np.dtype(column['dtype']) or len(array) != schema['rows']:
+            raise ValueError(f'binary table {target} does not match its schema')
+        columns[column['name']] = array
+    return pd.DataFrame(columns, copy=False)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert text data tables to memory-mapped binary column files.')
+    parser.add_argument('kind', choices=['thermo', 'area'], help='Table format')
+    parser.add_argument('files', nargs='+', help='Text tables to convert')
+    parser.add_argument('--cache-dir', default=TABLE_CACHE_DIR, help='Output directory')
+    args = parser.parse_args(argv)
+
+    if args.kind == 'thermo':
+        from thermo import load_thermodynamic_data as load
+    else:
+        from nozzle_area import load_area_data as load
+    for path in args.files:
+        df = load(path, cache_dir=args.cache_dir)
+        if isinstance(df, tuple):
+            df = df[0]
+        print(f'{path}: {len(df)} rows -> {_table_path(path, args.cache_dir)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Equilibrium solutions of many nozzle contours for one gas and reservoir condition.
+
+The reservoir state, the isentrope and the sonic state do not depend on the geometry, so they are
+computed once. Every profile's throat is located to sub-grid accuracy (nozzle_area.find_throat),
+and the stations of all profiles are solved together in one batched direct-method pass
+(direct_method.solve_area_ratios).
+
+    python contours.py --area data/area.dat other_area.dat --p0 5e6 --T0 4500
+    python contours.py --parabolic 0 1 2 5 --parabolic 0 1 2 10 --stations 1000
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+import instrument
+import nozzle
+import write_to_csv
+from direct_method import solve_area_ratios
+from nozzle_area import find_throat, load_area_data, parabolic_contour
+from solution import NozzleSolution
+
+HEADERS = ["Profile"] + nozzle.OUTPUT_HEADERS
+
+
+def solve_contours(p0, T0, profiles, thermo_file=nozzle.THERMO_DATA, tabulated=False, center_tol=None,
+                   isentrope=True, rtol=1e-6, max_iterations=100):
+    """
+    Equilibrium nozzle solutions of many area profiles for one reservoir condition.
+
+    Args:
+    - p0: Reservoir pressure (Pa).
+    - T0: Reservoir temperature (K).
+    - profiles: Sequence of (x, A) pairs, one per profile (profiles may have different station counts).
+    - thermo_file: Thermodynamic table.
+    - tabulated: Query a bicubic table of the surrogate instead of the RBF itself.
+    - center_tol: Fit the surrogate on a reduced set of centers with this error target (None uses every row).
+    - isentrope: Answer the queries from 1D splines along the reservoir isentrope.
+    - rtol: Relative tolerance on the area of each station.
+    - max_iterations: Maximum number of root finder iterations.
+
+    Returns:
+    - Dictionary with 'h0', 's0', 'sonic' (see nozzle.sonic_state), 'throats' ((x_star, A_star) arrays,
+      one entry per profile), 'solution' (NozzleSolution of the stations of every profile, one after the
+      other, NaN where a station did not converge), 'solutions' (per profile views of it, see
+      NozzleSolution.split) and 'iterations'.
+    """
+    profiles = [(np.asarray(x, dtype=np.float64), np.asarray(A, dtype=np.float64)) for x, A in profiles]
+    with instrument.stage('tables'):
+        df = nozzle.load_thermo(thermo_file)
+    with instrument.stage('reservoir'):
+        h0, s0 = nozzle.reservoir_state(p0, T0, df)
+    with instrument.stage('surrogate'):
+        surrogate = nozzle.build_surrogate(df, tabulated, center_tol, (s0, h0))
+    if isentrope:
+        from thermo import construct_isentrope_surrogate
+        surrogate = construct_isentrope_surrogate(surrogate, s0, h0)
+    with instrument.stage('sonic'):
+        sonic = nozzle.sonic_state(s0, h0, surrogate)
+
+    with instrument.stage('contours'):
+        # Throats of every profile, then the stations of all profiles as one batch of area ratios
+        throats = [find_throat(x, A)[:2] for x, A in profiles]
+        x = np.concatenate([x for x, A in profiles])
+        area_ratio = np.concatenate([A / A_star for (_, A), (_, A_star) in zip(profiles, throats)])
+        supersonic = np.concatenate([profile_x > x_star for (profile_x, _), (x_star, _) in zip(profiles, throats)])
+
+        h, iterations, converged = solve_area_ratios(s0, h0, area_ratio, supersonic, sonic['F_rho_a_star'],
+                                                     sonic['h_star'], surrogate, rtol, max_iterations)
+        instrument.solver('contours', iterations, converged)
+        h[~converged] = np.nan
+
+        # Properties at every solved station (one batched evaluation)
+        solution = NozzleSolution.empty(len(h), method='contours', p0=p0, T0=T0, s0=s0, h0=h0)
+        properties = surrogate(s0, h)
+        solution.h = h
+        solution.rho = properties['rho']
+        solution.p = properties['p']
+        solution.T = properties['T']
+        solution.u = np.sqrt(2 * (h0 - h))
+        solution.M = solution.u / properties['SpeedOfSound']
+        solution.x = x
+        bounds = np.cumsum([len(A) for _, A in profiles])[:-1]
+
+    return {'h0': h0, 's0': s0, 'sonic': sonic, 'throats': tuple(np.array(value) for value in zip(*throats)),
+            'solution': solution, 'solutions': solution.split(bounds), 'iterations': iterations}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve the equilibrium flow through many nozzle contours.')
+    parser.add_argument('--p0', type=float, default=5000000, help='Reservoir pressure (Pa)')
+    parser.add_argument('--T0', type=float, default=4500, help='Reservoir temperature (K)')
+    parser.add_argument('--thermo', default=nozzle.THERMO_DATA, help='Thermodynamic table')
+    parser.add_argument('--area', nargs='+', default=[], help='Area profile files')
+    parser.add_argument('--parabolic', nargs=4, type=float, action='append', default=[],
+                        metavar=('X_THROAT', 'A_STAR', 'A_INLET', 'A_EXIT'),
+                        help='Parabolic contour (see nozzle_area.parabolic_contour); may be repeated')
+    parser.add_argument('--stations', type=int, default=500,
+                        help='Stations of the parabolic contours, spanning the x range of the first profile '
+                             'file (or of data/area.dat)')
+    parser.add_argument('--output', default='data/contours.dat', help='Output file')
+    parser.add_argument('--no-isentrope', action='store_true',
+                        help='Query the 2D surrogate instead of splines along the reservoir isentrope')
+    parser.add_argument('--timing', action='store_true',
+                        help='Print stage times, solver iterations, surrogate batch sizes and peak memory')
+    args = parser.parse_args(argv)
+    if args.timing:
+        instrument.enable()
+
+    with instrument.stage('tables'):
+        areas = [load_area_data(os.path.abspath(path)) for path in args.area]
+    profiles = [(area['x'].values, area['A'].values) for area in areas]
+    if args.parabolic:
+        span = profiles[0][0] if profiles else load_area_data(os.path.abspath(nozzle.AREA_DATA))['x'].values
+        x = np.linspace(span[0], span[-1], args.stations)
+        parameters = np.array(args.parabolic).T
+        profiles += [(x, A) for A in parabolic_contour(x, *parameters)]
+    if not profiles:
+        parser.error('give at least one --area file or --parabolic contour')
+
+    result = solve_contours(args.p0, args.T0, profiles, args.thermo, isentrope=not args.no_isentrope)
+    solutions = result['solutions']
+    index = np.repeat(np.arange(len(solutions)), [solution.stations for solution in solutions])
+    write_to_csv.write_columns(args.output, (index,) + result['solution'].columns(nozzle.OUTPUT_COLUMNS), HEADERS)
+
+    for i, (x_star, A_star, solution) in enumerate(zip(*result['throats'], solutions)):
+        print(f'profile {i}: x* = {x_star:.6g} m, A* = {A_star:.6g}, exit Mach {solution.M[-1]:.6g}')
+    print(f'Completed {len(solutions)} profiles ({result["solution"].stations} rows) -> {args.output}')
+    if args.timing:
+        instrument.print_report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+This file is licensed under the MIT License.
+Copyright (c) 2024 Marco Panesi, Center for Hypersonics and Entry Systems Studies (CHESS), University of Illinois.
+
+The original project provided a framework with blank functions.
+This file has been significantly modified and fully implemented by awang104-2 since 11-20-2024.
+
+The full license text is available in the LICENSE file in the project root.
+"""
+
+import numpy as np
+
+import instrument
+from root_finding import find_roots_newton
+from solution import NozzleSolution
+
+
+def process_nozzle_direct_method(s0, h0, Area, A_x, A_star, F_rho_a_star, index_star, h_star, surrogate,
+                                 rtol=1e-6, max_iterations=100, full_output=False):
+    """
+    Routine to compute thermodynamic properties at every station of the nozzle (direct LTE approach).
+
+    For each station the enthalpy h is found such that the area required by mass conservation,
+    A(h) = F_rho_a_star * A_star / (rho(s0, h) * u(h)) with u = sqrt(2 * (h0 - h)), equals the
+    station's area. Upstream of the throat h lies in (h_star, h0), downstream below h_star. All
+    stations are solved together with a safeguarded Newton iteration, one surrogate call (values
+    and analytic derivatives) per iteration.
+
+    Args:
+    - s0: Initial entropy value.
+    - h0: Reservoir enthalpy value.
+    - Area: DataFrame with area and position information.
+    - A_x: List or array of area values along the nozzle.
+    - A_star: Throat area (minimum area).
+    - F_rho_a_star: Mass flow rate divided by A_star (rho_star * a_star).
+    - index_star: Index of the throat in A_x.
+    - h_star: Enthalpy at the throat.
+    - surrogate: Thermodynamic surrogate (thermo.ThermoSurrogate) returning rho, SpeedOfSound, p and T.
+    - rtol: Relative tolerance on the area of each station (see solve_area_ratios for stalled stations).
+    - max_iterations: Maximum number of root finder iterations.
+    - full_output: If True, also return a dictionary with iteration and convergence information.
+
+    Returns:
+    - NozzleSolution (enthalpy, velocity, density, pressure, temperature, Mach number, and x positions),
+      one entry per station of A_x (NaN where a station did not converge).
+    - info (only if full_output): {'iterations': int, 'converged': bool array, 'max_area_error': float}.
+    """
+    A_x = np.asarray(A_x, dtype=np.float64)
+    h0, s0, h_star = float(h0), float(s0), float(h_star)
+    flux = float(np.squeeze(F_rho_a_star)) * A_star  # Mass flow rate
+    stations = np.arange(len(A_x))
+    area_ratio = A_x / A_star
+    area_ratio[index_star] = 1  # The throat station is h_star by definition
+    h_values, iterations, converged = solve_area_ratios(s0, h0, area_ratio, stations > index_star, F_rho_a_star,
+                                                        h_star, surrogate, rtol, max_iterations)
+    instrument.solver('direct', iterations, converged)
+    h_values[~converged] = np.nan
+
+    # Finding thermodynamic properties at the solved enthalpies (one batched evaluation)
+    solution = NozzleSolution.empty(len(A_x), method='direct', s0=s0, h0=h0)
+    properties = surrogate(s0, h_values)
+    solution.h = h_values
+    solution.rho = properties['rho']
+    solution.p = properties['p']
+    solution.T = properties['T']
+    solution.u = np.sqrt(2 * (h0 - h_values))
+    solution.M = solution.u / properties['SpeedOfSound']
+    solution.x = Area['x']
+
+    if full_output:
+        area_error = np.abs(flux / (solution.rho * solution.u) / A_x - 1)
+        info = {'iterations': iterations, 'converged': converged,
+                'max_area_error': float(np.nanmax(area_error[stations != index_star], initial=0))}
+        return solution, info
+    return solution
+
+
+def solve_area_ratios(s0, h0, area_ratio, supersonic, F_rho_a_star, h_star, surrogate, rtol=1e-6, max_iterations=100):
+    """
+    Finds the enthalpy at which the isentropic flow from (s0, h0) has each given area ratio A / A_star.
+
+    The stations may come from any number of nozzles: the area ratio as a function of h only
+    depends on the gas and the reservoir state. Subsonic entries lie in (h_star, h0), supersonic
+    ones below h_star, and entries with area_ratio <= 1 are at the throat (h_star). Every entry
+    is solved together with a safeguarded Newton iteration, one surrogate call per iteration.
+
+    Args:
+    - s0: Reservoir entropy.
+    - h0: Reservoir enthalpy.
+    - area_ratio: Array of area ratios A / A_star.
+    - supersonic: Boolean array, True for entries downstream of the throat.
+    - F_rho_a_star: Mass flow rate divided by A_star (rho_star * a_star).
+    - h_star: Enthalpy at the throat.
+    - surrogate: Thermodynamic surrogate returning rho (and its derivatives with gradient=True).
+    - rtol: Relative tolerance on the area of each entry.
+    - max_iterations: Maximum number of root finder iterations.
+
+    Returns:
+    - Array of enthalpies.
+    - Number of iterations.
+    - Boolean array, False where an entry did not converge. An entry also counts as converged when its
+      Newton step stalls (relative step in log(h0 - h) below 1e-12) with the area residual still above
+      rtol: the residual is then at the noise floor of the surrogate and cannot be reduced further
+      (process_nozzle_direct_method reports the actual residual as 'max_area_error').
+    """
+    area_ratio = np.asarray(area_ratio, dtype=np.float64)
+    supersonic = np.asarray(supersonic, dtype=bool)
+    h0, s0, h_star = float(h0), float(s0), float(h_star)
+    F_star = float(np.squeeze(F_rho_a_star))
+    entries = np.arange(len(area_ratio))
+    throat = area_ratio <= 1
+
+    # Area mismatch of an entry at enthalpy h (log ratio)
+    def area_residual(h, index):
+        rho = surrogate(s0, h)['rho']
+        u = np.sqrt(2 * (h0 - h))
+        return np.log(F_star / (rho * u) / area_ratio[index])
+
+    # Area mismatch in terms of v = log(h0 - h) and its derivative, d/dv = (drho/dh / rho) * (h0 - h) - 1/2
+    def area_residual_log(v, index):
+        h = h0 - np.exp(v)
+        properties = surrogate(s0, h, gradient=True)
+        rho = properties['rho']
+        u = np.sqrt(2 * (h0 - h))
+        return np.log(F_star / (rho * u) / area_ratio[index]), properties['drho_dh'] / rho * (h0 - h) - 0.5
+
+    # Subsonic entries lie between the throat and the (infinite area) reservoir state
+    low = np.full(len(area_ratio), h_star)
+    high = np.full(len(area_ratio), h0 * (1 - 1e-9))
+
+    # Supersonic entries lie below h_star; push the lower bracket down until the area is large enough
+    high[supersonic] = h_star
+    low[supersonic] = 0.5 * h_star
+    below = entries[supersonic & ~throat]
+    for _ in range(8):
+        below = below[area_residual(low[below], below) <= 0]
+        if below.size == 0:
+            break
+        low[below] *= 0.5
+
+    # Solving every entry at once
+    # The unknown is v = log(h0 - h): log A is then close to linear in v, so the Newton steps converge quickly
+    solve = entries[~throat]
+    v, iterations, converged_solve = find_roots_newton(
+        lambda v, index: area_residual_log(v, solve[index]),
+        np.log(h0 - high[solve]), np.log(h0 - low[solve]), 1e-12, max_iterations, ftol=rtol)
+    h_values = np.full(len(area_ratio), h_star)
+    h_values[solve] = h0 - np.exp(v)
+    converged = np.ones(len(area_ratio), dtype=bool)
+    converged[solve] = converged_solve
+    return h_values, iterations, converged
@@ -10,65 +10,76 @@ The full license text is available in the LICENSE file in the project root.
 
 import numpy as np
 
+import instrument
+from solution import NozzleSolution
 
-def process_nozzle_perfect_gas(gamma, R, p0, T0, Area, A_x, A_star, index_star):
+
+def process_nozzle_perfect_gas(gamma, R, p0, T0, Area, A_x, A_star, index_star, tol=1e-12, max_iterations=50,
+                               full_output=False):
 
     """
     Routine to compute flow properties in a nozzle for a perfect gas using the area-Mach number relation.
 
+    The area-Mach relation is solved for all stations (and all gas/reservoir conditions) at once
+    with Newton's method, stopping when every relative Mach number update is below 'tol'.
+
     Args:
-    - gamma: Specific heat ratio (Cp/Cv).
-    - R: Gas constant (J/kg·K).
-    - p0: Total (stagnation) pressure (Pa).
-    - T0: Total (stagnation) temperature (K).
+    - gamma: Specific heat ratio (Cp/Cv), scalar or array.
+    - R: Gas constant (J/kg·K), scalar or array.
+    - p0: Total (stagnation) pressure (Pa), scalar or array.
+    - T0: Total (stagnation) temperature (K), scalar or array.
     - Area: DataFrame with area and position information.
     - A_x: List or array of area values along the nozzle.
     - A_star: Throat area (minimum area).
     - index_star: Index of the throat in A_x.
+    - tol: Relative tolerance on the Mach number update.
+    - max_iterations: Maximum number of Newton iterations.
+    - full_output: If True, also return a dictionary with the iteration count and convergence flags.
 
     Returns:
-    - Lists of enthalpy, velocity, density, pressure, temperature, Mach number, and x positions.
+    - NozzleSolution (enthalpy, velocity, density, pressure, temperature, Mach number, and x positions).
+      Array-valued gamma, R, p0 and T0 are broadcast together; each column then has that shape
+      with the stations along the last axis (solution.case(i) selects one condition).
+    - info (only if full_output): {'iterations': int, 'converged': bool array, 'max_step': float}.
     """
+    # Gas and reservoir parameters get a trailing station axis
+    gamma, R, p0, T0 = (np.asarray(value, dtype=np.float64)[..., np.newaxis] for value in (gamma, R, p0, T0))
+    area_ratio = np.asarray(A_x, dtype=np.float64) / A_star
+    shape = np.broadcast_shapes(gamma.shape, R.shape, p0.shape, T0.shape, area_ratio.shape)
+
+    # Constants of the area-Mach relation, computed once
+    exponent = (gamma + 1) / (2 * (gamma - 1))
+    coefficient = (2 / (gamma + 1))**exponent
+
+    # Initial guesses: subsonic upstream of the throat, supersonic downstream
+    supersonic = np.arange(area_ratio.shape[-1]) >= index_star
+    M = np.broadcast_to(np.where(supersonic, 2.0, 0.5), shape).copy()
+
+    # Finds the corresponding Mach numbers using Newton's method
+    converged = np.zeros(shape, dtype=bool)
+    step = np.zeros(shape)
+    iterations = 0
+    while iterations < max_iterations and not converged.all():
+        iterations += 1
+        f = coefficient / M * (1 + (gamma - 1) / 2 * M**2)**exponent - area_ratio
+        Df = (2 * M**2 - 2) * (((gamma - 1) * M**2 + 2) / (gamma + 1))**exponent / ((gamma - 1) * M**4 + 2 * M**2)
+        step = np.divide(f, Df, out=np.zeros(shape), where=Df != 0)  # Df vanishes only exactly at the throat
+        M -= step
+        converged = np.abs(step) <= tol * np.abs(M)
+
+    instrument.solver('frozen', iterations, converged)
+
+    # Finding thermodynamic properties, written into one solution block
+    solution = NozzleSolution.empty(shape, method='frozen')
+    solution.M = M
+    solution.T = T0 * 1 / (1 + (gamma - 1) / 2 * M**2)
+    solution.p = p0 * (solution.T / T0)**(gamma / (gamma - 1))
+    solution.rho = solution.p / (R * solution.T)
+    solution.u = M * np.sqrt(gamma * R * solution.T)
+    solution.h = gamma * R / (gamma - 1) * solution.T
+    solution.x = np.asarray(Area['x'], dtype=np.float64)
 
-    # Initialize empty lists of the function's returns
-    enthalpy_values = []
-    velocity_values = []
-    density_values = []
-    pressure_values = []
-    temperature_values = []
-    mach_values = []
-    x_positions = []
-
-    for i, A_i in enumerate(A_x):
-        # Finds the corresponding Mach number using Newton's method
-        iterations = 50  # Number of Newton's method iterations
-        M = 0  # Test Mach number
-        if i < index_star:  # subsonic regime
-            M = 0.5  # Initial guess
-        else:
-            M = 2  # Initial guess
-        for k in range(iterations):
-            exponent = ((gamma + 1) / (2 * (gamma - 1)))
-            f = (1 / M) * (2 / (gamma + 1))**exponent * (1 + (gamma - 1) / 2 * M**2)**exponent - (A_i / A_star)
-            Df = (2 * M**2 - 2) * (((gamma - 1) * M**2 + 2) / (gamma + 1))**exponent / ((gamma - 1) * M**4 + 2 * M**2)
-            M = M - f / Df
-
-        # Finding thermodynamic properties
-        T = T0 * 1 / (1 + (gamma - 1) / 2 * M**2)
-        p = p0 * (T / T0)**(gamma / (gamma - 1))
-        rho = p / (R * T)
-        a = np.sqrt(gamma * R * T)
-        u = M * a
-        h = gamma * R / (gamma - 1) * T
-        x = Area['x'][i]
-
-        # Adding thermodynamic properties to lists
-        enthalpy_values.append(h)
-        velocity_values.append(u)
-        density_values.append(rho)
-        pressure_values.append(p)
-        temperature_values.append(T)
-        mach_values.append(M)
-        x_positions.append(x)
-
-    return enthalpy_values, velocity_values, density_values, pressure_values, temperature_values, mach_values, x_positions
+    if full_output:
+        info = {'iterations': iterations, 'converged': converged, 'max_step': float(np.max(np.abs(step), initial=0))}
+        return solution, info
+    return solution
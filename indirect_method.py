@@ -9,15 +9,27 @@ The full license text is available in the LICENSE file in the project root.
 """
 
 import numpy as np
-from nozzle_area import find_closest_index
 
+import instrument
+from nozzle_area import AreaIndex
+from solution import NozzleSolution
 
-def process_nozzle_indirect_method(s0, h0, Area, A_x, A_star, F_rho_a_star, index_star, rbf_interpolator_rho,
-                                   rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature):
+
+def process_nozzle_indirect_method(s0, h0, Area, A_x, A_star, F_rho_a_star, index_star, surrogate, area_index=None,
+                                   placement='linear', sampling='uniform', dx_tol=5e-4, rtol=2e-2,
+                                   max_samples=2000, full_output=False):
     """
     Routine to compute the inlet velocity using the bisection method,
     and calculate thermodynamic properties along the nozzle.
 
+    All test enthalpies are evaluated in a single batched surrogate call, and the subsonic and
+    supersonic samples are placed on their branch of the area profile by binary search.
+
+    With sampling='adaptive' a coarse set of enthalpies is refined instead: every pair of
+    neighbouring samples that is more than dx_tol apart in x, or whose velocity, density,
+    pressure, temperature or Mach number differ by more than rtol (relative), gets a midpoint.
+    Each refinement pass is one batched surrogate call.
+
     Args:
     - s0: Initial entropy value.
     - h0: Reservoir enthalpy value.
@@ -26,55 +38,79 @@ def process_nozzle_indirect_method(s0, h0, Area, A_x, A_star, F_rho_a_star, inde
     - A_star: Throat area (minimum area).
     - F_rho_a_star: Mass flow rate divided by A_star (rho_star * a_star).
     - index_star: Index of the throat in A_x.
-    - rbf_interpolator_*: Interpolators for thermodynamic properties.
+    - surrogate: Thermodynamic surrogate (thermo.ThermoSurrogate) returning rho, SpeedOfSound, p and T.
+    - area_index: Precomputed nozzle_area.AreaIndex of the profile (built from Area and A_x if None).
+    - placement: 'linear' or 'spline' to interpolate x between profile rows, 'nearest' to snap to the closest row.
+    - sampling: 'uniform' (500 evenly spaced enthalpies) or 'adaptive'.
+    - dx_tol: Largest allowed spacing in x between neighbouring samples (adaptive sampling).
+    - rtol: Largest allowed relative property change between neighbouring samples (adaptive sampling).
+    - max_samples: Upper limit on the number of samples (adaptive sampling).
+    - full_output: If True, also return a dictionary with the number of samples and surrogate calls.
 
     Returns:
-    - Lists of enthalpy, velocity, density, pressure, temperature, Mach number, and x positions.
+    - NozzleSolution (enthalpy, velocity, density, pressure, temperature, Mach number, and x positions).
+    - info (only if full_output): {'samples': int, 'evaluations': int, 'converged': bool}.
     """
-    # Initialize lists
-    enthalpy_values = []
-    velocity_values = []
-    density_values = []
-    pressure_values = []
-    temperature_values = []
-    mach_values = []
-    x_positions = []
-
     h_inlet = h0 * 0.99  # "Inlet enthalpy" for graphical reasons
-    h_values = np.linspace(h_inlet, 0.5 * h0, 500)  # Test enthalpy values
-
-    # For each enthalpy value, finds the closest x value using the indirect LTE approach
-    for h in h_values:
-        if h <= h_inlet:  # Ignore enthalpies greater than inlet
-            # Converted to log input for interpolator
-            log_input = np.log([s0, h]).reshape(1, -1)
-
-            # Finding thermodynamic properties
-            rho = np.exp(rbf_interpolator_rho(log_input))[0]
-            speed_of_sound = np.exp(rbf_interpolator_speed(log_input))[0]
-            pressure = np.exp(rbf_interpolator_pressure(log_input))[0]
-            temperature = np.exp(rbf_interpolator_temperature(log_input))[0]
-            velocity = np.sqrt(2 * (h0 - h))
-            mach = velocity / speed_of_sound
-            area = (F_rho_a_star / (rho * velocity) * A_star)[0]
-
-            # Checks regime
-            if mach < 1:
-                index = find_closest_index(A_x[:index_star], area)
-            else:
-                index = index_star + find_closest_index(A_x[index_star:], area)
-            x = Area['x'][index]
-
-            # Append the computed properties
-            enthalpy_values.append(h)
-            velocity_values.append(velocity)
-            density_values.append(rho)
-            pressure_values.append(pressure)
-            temperature_values.append(temperature)
-            mach_values.append(mach)
-            x_positions.append(x)
-
-    return enthalpy_values, velocity_values, density_values, pressure_values, temperature_values, mach_values, x_positions
-
-
-
+    if area_index is None:
+        area_index = AreaIndex(Area['x'], A_x, index_star)
+
+    def evaluate(h_values):
+        # Finding thermodynamic properties for every test enthalpy at once, written into one solution block
+        solution = NozzleSolution.empty(len(h_values))
+        properties = surrogate(s0, h_values)
+        solution.h = h_values
+        solution.rho = properties['rho']
+        solution.p = properties['p']
+        solution.T = properties['T']
+        solution.u = np.sqrt(2 * (h0 - h_values))
+        solution.M = solution.u / properties['SpeedOfSound']
+        area = F_rho_a_star / (solution.rho * solution.u) * A_star
+
+        # For each enthalpy value, finds the x value on the branch given by the regime
+        solution.x = area_index.position(area, solution.M >= 1, placement)
+        return solution
+
+    if sampling == 'uniform':
+        h_values = np.linspace(h_inlet, 0.5 * h0, 500)  # Test enthalpy values
+        h_values = h_values[h_values <= h_inlet]  # Ignore enthalpies greater than inlet
+        solution = evaluate(h_values)
+        info = {'samples': len(h_values), 'evaluations': 1, 'converged': True}
+    elif sampling == 'adaptive':
+        solution, info = _refine_samples(evaluate, np.linspace(h_inlet, 0.5 * h0, 17), dx_tol, rtol, max_samples)
+        instrument.solver('indirect_refinement', info['evaluations'], info['converged'])
+    else:
+        raise ValueError(f"unknown sampling '{sampling}'")
+
+    solution.metadata.update(method='indirect', s0=float(s0), h0=float(h0))
+    if full_output:
+        return solution, info
+    return solution
+
+
+def _refine_samples(evaluate, h_values, dx_tol, rtol, max_samples):
+    # Bisects the enthalpy intervals whose neighbouring samples are too far apart in x or in the flow properties
+    columns = evaluate(h_values).data  # Rows: h, u, rho, p, T, M, x
+    evaluations = 1
+    converged = False
+    while True:
+        dx = np.abs(np.diff(columns[6]))
+        properties = columns[1:6]
+        change = np.abs(np.diff(properties, axis=1)) / np.maximum(np.abs(properties[:, 1:]), np.abs(properties[:, :-1]))
+        refine = np.flatnonzero((dx > dx_tol) | (np.fmax.reduce(change, axis=0) > rtol))
+        if refine.size == 0:
+            converged = True
+            break
+        room = max_samples - columns.shape[1]
+        if room <= 0:
+            break
+        refine = refine[:room]
+
+        # Evaluate all new midpoints at once and merge them in (enthalpy decreases along the samples)
+        h = columns[0]
+        new_columns = evaluate((h[refine] + h[refine + 1]) / 2).data
+        evaluations += 1
+        columns = np.insert(columns, refine + 1, new_columns, axis=1)
+
+    info = {'samples': columns.shape[1], 'evaluations': evaluations, 'converged': converged}
+    return NozzleSolution(columns), info
@@ -0,0 +1,193 @@
+"""
+Opt-in instrumentation of the nozzle pipeline.
+
+When enabled (enable(), or the environment variable NOZZLE_INSTRUMENT=1) the pipeline records:
+- wall time per stage (stage),
+- surrogate/interpolator call counts and batch sizes (count),
+- solver iteration counts and convergence failures (solver),
+and report() adds the peak resident memory of the process. When disabled every hook returns
+after a single flag check, so the instrumentation can stay in the hot paths.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+_enabled = os.environ.get('NOZZLE_INSTRUMENT', '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+_null = nullcontext()
+_start = time.perf_counter()
+
+# name -> [count, seconds]
+_stages = {}
+# name -> [calls, points, largest batch]
+_calls = {}
+# name -> [solves, entries, total iterations, most iterations, failed entries]
+_solvers = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    global _start
+    _stages.clear()
+    _calls.clear()
+    _solvers.clear()
+    _start = time.perf_counter()
+
+
+def stage(name):
+    """
+    Context manager timing one stage. Nested stages are recorded separately (times are inclusive).
+    """
+    if not _enabled:
+        return _null
+    return _timed(name)
+
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = _stages.setdefault(name, [0, 0.0])
+        record[0] += 1
+        record[1] += time.perf_counter() - start
+
+
+def count(name, points):
+    """
+    Records one call of an interpolator or surrogate evaluating 'points' query points.
+    """
+    if not _enabled:
+        return
+    record = _calls.setdefault(name, [0, 0, 0])
+    record[0] += 1
+    record[1] += points
+    record[2] = max(record[2], points)
+
+
+def solver(name, iterations, converged):
+    """
+    Records one (batched) solve: its iteration count and a boolean array (or bool) of converged entries.
+    """
+    if not _enabled:
+        return
+    converged = converged if isinstance(converged, bool) else converged.ravel()
+    entries = 1 if isinstance(converged, bool) else converged.size
+    failures = int(not converged) if isinstance(converged, bool) else int(entries - converged.sum())
+    record = _solvers.setdefault(name, [0, 0, 0, 0, 0])
+    record[0] += 1
+    record[1] += entries
+    record[2] += iterations
+    record[3] = max(record[3], iterations)
+    record[4] += failures
+
+
+def collect():
+    """
+    Returns the raw records and clears them (used to ship worker-process records to the parent).
+    """
+    records = {'stages': dict(_stages), 'calls': dict(_calls), 'solvers': dict(_solvers)}
+    _stages.clear()
+    _calls.clear()
+    _solvers.clear()
+    return records
+
+
+def merge(records):
+    """
+    Adds records returned by collect() (e.g. from a worker process) to this process's records.
+    """
+    for name, (number, seconds) in records['stages'].items():
+        record = _stages.setdefault(name, [0, 0.0])
+        record[0] += number
+        record[1] += seconds
+    for name, (calls, points, largest) in records['calls'].items():
+        record = _calls.setdefault(name, [0, 0, 0])
+        record[0] += calls
+        record[1] += points
+        record[2] = max(record[2], largest)
+    for name, (solves, entries, iterations, most, failures) in records['solvers'].items():
+        record = _solvers.setdefault(name, [0, 0, 0, 0, 0])
+        record[0] += solves
+        record[1] += entries
+        record[2] += iterations
+        record[3] = max(record[3], most)
+        record[4] += failures
+
+
+def peak_memory():
+    """
+    Peak resident memory in MB of this process and of its finished child processes (None if unknown).
+    """
+    if resource is None:
+        return {'self': None, 'children': None}
+    scale = 1 / 2**20 if sys.platform == 'darwin' else 1 / 2**10  # ru_maxrss is in bytes on macOS, KB elsewhere
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale}
+
+
+def report():
+    """
+    Returns the structured run report (a JSON-serializable dictionary).
+    """
+    return {
+        'wall_time': time.perf_counter() - _start,
+        'stages': {name: {'count': number, 'seconds': seconds} for name, (number, seconds) in _stages.items()},
+        'calls': {name: {'calls': calls, 'points': points, 'mean_batch': points / calls, 'max_batch': largest}
+                  for name, (calls, points, largest) in _calls.items()},
+        'solvers': {name: {'solves': solves, 'entries': entries, 'iterations': iterations,
+                           'max_iterations': most, 'failures': failures}
+                    for name, (solves, entries, iterations, most, failures) in _solvers.items()},
+        'peak_memory_mb': peak_memory(),
+    }
+
+
+def write_report(path, extra=None):
+    """
+    Writes report() (plus the entries of 'extra', such as the run parameters) as JSON.
+    """
+    data = report()
+    if extra:
+        data.update(extra)
+    with open(os.path.abspath(path), 'w') as file:
+        json.dump(data, file, indent=1)
+
+
+def print_report(file=sys.stderr):
+    """
+    Prints a readable summary of report().
+    """
+    data = report()
+    for name, entry in data['stages'].items():
+        print(f'stage   {name:<20}{entry["seconds"]:10.3f} s  ({entry["count"]}x)', file=file)
+    for name, entry in data['calls'].items():
+        print(f'calls   {name:<20}{entry["calls"]:10d}  points {entry["points"]}, '
+              f'mean batch {entry["mean_batch"]:.1f}, max batch {entry["max_batch"]}', file=file)
+    for name, entry in data['solvers'].items():
+        print(f'solver  {name:<20}{entry["solves"]:10d}  iterations {entry["iterations"]} '
+              f'(max {entry["max_iterations"]}), failures {entry["failures"]}/{entry["entries"]}', file=file)
+    memory = data['peak_memory_mb']
+    if memory['self'] is not None:
+        print(f'memory  {"peak":<20}{memory["self"]:10.1f} MB', file=file)
+    print(f'total   {"":<20}{data["wall_time"]:10.3f} s', file=file)
@@ -0,0 +1,310 @@
+"""
+Importable API and command line interface of the nozzle solver.
+
+    python -m nozzle run --p0 5e6 --T0 4500 [--direct] [--tabulated] [--no-plots]
+    python -m nozzle reservoir --p0 5e6 --T0 4500
+    python -m nozzle sonic --p0 5e6 --T0 4500
+    python -m nozzle frozen --p0 5e6 --T0 4500
+    python -m nozzle sweep --p0 5e6 --T0 4000 4500 [sweep.py options]
+    python -m nozzle contours --area data/area.dat other_area.dat [contours.py options]
+    python -m nozzle service serve [service.py options]
+
+Every stage imports its modules when it runs, so a reservoir lookup never loads matplotlib or
+fits the surrogate and a frozen-flow solution never touches the thermodynamic table.
+Add --timing to print the time spent in each stage (module imports included), solver iterations,
+surrogate batch sizes and peak memory (see instrument.py); `run --report` also writes them as JSON
+next to the output table.
+"""
+
+import argparse
+import os
+import sys
+
+import instrument
+
+THERMO_DATA = 'data/output.dat'
+AREA_DATA = 'data/area.dat'
+
+# Perfect-gas constants of the frozen-flow comparison
+R_FROZEN = 8.3144598 / 0.2672963120279829E-01
+GAMMA_FROZEN = 0.1242430995249157E+01
+
+OUTPUT_HEADERS = ["x positions (m)", "Enthalpy values (J/kg)", "Velocity values (m/s)", "Density values (kg/m^3)",
+                  "Pressure (Pa)", "Temperature (K)", "Mach number values"]
+OUTPUT_COLUMNS = ('x', 'h', 'u', 'rho', 'p', 'T', 'M')  # NozzleSolution columns in the order of OUTPUT_HEADERS
+
+
+def load_thermo(thermo_file=THERMO_DATA):
+    """
+    Loads the thermodynamic table (DataFrame with T, p, rho, MolarMass, Enthalpy, Entropy, SpeedOfSound).
+    """
+    from thermo import load_thermodynamic_data
+    return load_thermodynamic_data(os.path.abspath(thermo_file))[0]
+
+
+def load_nozzle(area_file=AREA_DATA):
+    """
+    Loads the area profile and locates the throat.
+
+    Returns:
+    - Area DataFrame (x, A), area array, throat area A_star and throat index.
+    """
+    from nozzle_area import load_area_data, find_astar, find_closest_index
+    Area = load_area_data(os.path.abspath(area_file))
+    x_star, A_star = find_astar(Area)
+    index_star = find_closest_index(Area['A'], A_star)
+    return Area, Area['A'], A_star, index_star
+
+
+def build_surrogate(df, tabulated=False, center_tol=None, focus=None):
+    """
+    Fits (or loads from the cache) the thermodynamic surrogate of a table.
+
+    With center_tol the RBF is fitted on a greedily selected subset of the rows (see
+    thermo.select_centers), with its accuracy concentrated around the reservoir state focus = (s0, h0).
+    """
+    from thermo import construct_thermo_surrogate
+    center_selection = None if center_tol is None else {'tol': center_tol, 'focus': focus}
+    return construct_thermo_surrogate(df, tabulate=tabulated, center_selection=center_selection)
+
+
+def reservoir_state(p0, T0, df):
+    """
+    Returns the reservoir enthalpy and entropy (h0, s0) for reservoir pressure p0 (Pa) and temperature T0 (K).
+    """
+    from reservoir import create_reservoir_interpolator, get_reservoir_h_and_s
+    return get_reservoir_h_and_s(p0, T0, create_reservoir_interpolator(df))
+
+
+def sonic_state(s0, h0, surrogate):
+    """
+    Returns the throat state {'h_star', 's_star', 'a_star', 'rho_star', 'F_rho_a_star'} of a reservoir state.
+    """
+    from sonic import compute_hstar_sstar, compute_rho_star_astar_Fstar
+    h_star, s_star = compute_hstar_sstar(s0, h0, surrogate)
+    a_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, surrogate)
+    return {'h_star': h_star, 's_star': s_star, 'a_star': a_star, 'rho_star': rho_star, 'F_rho_a_star': F_rho_a_star}
+
+
+def solve_frozen(p0, T0, area_file=AREA_DATA, gamma=GAMMA_FROZEN, R=R_FROZEN):
+    """
+    Frozen (perfect-gas) nozzle solution; needs only the area profile.
+    """
+    from frozen import process_nozzle_perfect_gas
+    Area, A_x, A_star, index_star = load_nozzle(area_file)
+    return process_nozzle_perfect_gas(gamma, R, p0, T0, Area, A_x, A_star, index_star)
+
+
+def solve_nozzle(p0, T0, thermo_file=THERMO_DATA, area_file=AREA_DATA, tabulated=False, direct=False,
+                 frozen=True, center_tol=None, isentrope=True, sampling='uniform'):
+    """
+    Equilibrium nozzle solution for one reservoir condition.
+
+    Args:
+    - p0: Reservoir pressure (Pa).
+    - T0: Reservoir temperature (K).
+    - thermo_file: Thermodynamic table.
+    - area_file: Nozzle area profile.
+    - tabulated: Query a bicubic table of the surrogate instead of the RBF itself.
+    - direct: Also solve every station of the area profile with the direct method.
+    - frozen: Also compute the frozen-flow solution.
+    - center_tol: Fit the surrogate on a reduced set of centers with this error target (None uses every row).
+    - isentrope: Answer the queries at s0 from 1D splines along the isentrope (thermo.IsentropeSurrogate)
+      instead of the 2D surrogate.
+    - sampling: Indirect-method sampling, 'uniform' or 'adaptive' (see process_nozzle_indirect_method).
+
+    Returns:
+    - Dictionary with 'h0', 's0', 'sonic' (see sonic_state), 'lte' (indirect-method solution),
+      'direct' and 'frozen' (solutions or None), 'area' ((x, A) of the profile) and 'isentrope_error'
+      (largest relative difference of the isentrope splines from the 2D surrogate, None if not used).
+      A reservoir condition outside the table gives NaN states and solutions.
+    """
+    with instrument.stage('tables'):
+        df = load_thermo(thermo_file)
+        Area, A_x, A_star, index_star = load_nozzle(area_file)
+    with instrument.stage('reservoir'):
+        h0, s0 = reservoir_state(p0, T0, df)
+    with instrument.stage('surrogate'):
+        surrogate = build_surrogate(df, tabulated, center_tol, (s0, h0))
+    isentrope_error = None
+    if isentrope:
+        from thermo import construct_isentrope_surrogate, IsentropeSurrogate
+        surrogate = construct_isentrope_surrogate(surrogate, s0, h0)
+        if isinstance(surrogate, IsentropeSurrogate):  # Not built for a reservoir state outside the table
+            isentrope_error = surrogate.max_error
+    with instrument.stage('sonic'):
+        sonic = sonic_state(s0, h0, surrogate)
+
+    results = {'h0': h0, 's0': s0, 'sonic': sonic, 'direct': None, 'frozen': None,
+               'area': (Area['x'].values, A_x.values), 'isentrope_error': isentrope_error}
+    with instrument.stage('indirect'):
+        from indirect_method import process_nozzle_indirect_method
+        results['lte'] = process_nozzle_indirect_method(s0, h0, Area, A_x, A_star, sonic['F_rho_a_star'],
+                                                        index_star, surrogate, sampling=sampling)
+    if direct:
+        with instrument.stage('direct'):
+            from direct_method import process_nozzle_direct_method
+            results['direct'] = process_nozzle_direct_method(s0, h0, Area, A_x, A_star, sonic['F_rho_a_star'],
+                                                             index_star, sonic['h_star'], surrogate)
+    if frozen:
+        with instrument.stage('frozen'):
+            from frozen import process_nozzle_perfect_gas
+            results['frozen'] = process_nozzle_perfect_gas(GAMMA_FROZEN, R_FROZEN, p0, T0, Area, A_x, A_star,
+                                                           index_star)
+    return results
+
+
+def write_solution(filename, solution):
+    """
+    Writes a nozzle solution (solution.NozzleSolution) as a tab separated table, x first.
+    """
+    import write_to_csv
+    write_to_csv.write_columns(filename, solution.columns(OUTPUT_COLUMNS), OUTPUT_HEADERS)
+
+
+def run(p0, T0, thermo_file=THERMO_DATA, area_file=AREA_DATA, tabulated=False, direct=False, plots_dir='graphs',
+        output='data/nozzle_thermo_properties.dat', direct_output='data/nozzle_direct_properties.dat',
+        report=False, center_tol=None, isentrope=True, sampling='uniform'):
+    """
+    Solves the nozzle, writes the solution tables and renders the plots (skipped if plots_dir is None).
+
+    With report=True the run is instrumented and its report is written next to 'output'
+    (<output name>_report.json, see instrument.report).
+    """
+    instrumented = instrument.enabled()
+    if report:
+        instrument.enable()
+        instrument.reset()
+    try:
+        results = _run(p0, T0, thermo_file, area_file, tabulated, direct, plots_dir, output, direct_output,
+                       center_tol, isentrope, sampling)
+        if report:
+            instrument.write_report(os.path.splitext(output)[0] + '_report.json',
+                                    {'parameters': {'p0': p0, 'T0': T0, 'thermo': thermo_file, 'area': area_file,
+                                                    'tabulated': tabulated, 'direct': direct, 'plots': plots_dir,
+                                                    'center_tol': center_tol, 'isentrope': isentrope,
+                                                    'sampling': sampling},
+                                     'isentrope_error': results['isentrope_error']})
+    finally:
+        if not instrumented:
+            instrument.disable()
+    return results
+
+
+def _run(p0, T0, thermo_file, area_file, tabulated, direct, plots_dir, output, direct_output, center_tol,
+         isentrope, sampling):
+    results = solve_nozzle(p0, T0, thermo_file, area_file, tabulated, direct, frozen=plots_dir is not None,
+                           center_tol=center_tol, isentrope=isentrope, sampling=sampling)
+    with instrument.stage('write'):
+        write_solution(output, results['lte'])
+        if direct:
+            write_solution(direct_output, results['direct'])
+    if plots_dir is not None:
+        with instrument.stage('plots'):
+            import plots
+            plots.render_solution(results['lte'], results['frozen'], area=results['area'], out_dir=plots_dir)
+    return results
+
+
+def _add_conditions(parser):
+    parser.add_argument('--p0', type=float, default=5000000, help='Reservoir pressure (Pa)')
+    parser.add_argument('--T0', type=float, default=4500, help='Reservoir temperature (K)')
+    parser.add_argument('--timing', action='store_true',
+                        help='Print stage times, solver iterations, surrogate batch sizes and peak memory')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='nozzle', description='Equilibrium flow through a converging-diverging nozzle.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('run', help='Solve the nozzle, write the tables and plot')
+    _add_conditions(command)
+    command.add_argument('--thermo', default=THERMO_DATA, help='Thermodynamic table')
+    command.add_argument('--area', default=AREA_DATA, help='Nozzle area profile')
+    command.add_argument('--direct', action='store_true', help='Also solve with the direct method')
+    command.add_argument('--tabulated', action='store_true', help='Use the bicubic table of the surrogate')
+    command.add_argument('--centers', type=float, metavar='TOL',
+                         help='Fit the surrogate on greedily selected centers with this error target')
+    command.add_argument('--no-isentrope', action='store_true',
+                         help='Query the 2D surrogate instead of splines along the reservoir isentrope')
+    command.add_argument('--adaptive', action='store_true',
+                         help='Refine the indirect-method samples adaptively instead of 500 uniform enthalpies')
+    command.add_argument('--plots', default='graphs', help='Plot directory')
+    command.add_argument('--no-plots', action='store_true', help='Skip plotting (matplotlib is not imported)')
+    command.add_argument('--output', default='data/nozzle_thermo_properties.dat', help='Output file')
+    command.add_argument('--report', action='store_true', help='Write the run report (JSON) next to the output file')
+
+    command = commands.add_parser('reservoir', help='Print the reservoir enthalpy and entropy')
+    _add_conditions(command)
+    command.add_argument('--thermo', default=THERMO_DATA, help='Thermodynamic table')
+
+    command = commands.add_parser('sonic', help='Print the reservoir and throat states')
+    _add_conditions(command)
+    command.add_argument('--thermo', default=THERMO_DATA, help='Thermodynamic table')
+    command.add_argument('--tabulated', action='store_true', help='Use the bicubic table of the surrogate')
+    command.add_argument('--centers', type=float, metavar='TOL',
+                         help='Fit the surrogate on greedily selected centers with this error target')
+    command.add_argument('--no-isentrope', action='store_true',
+                         help='Query the 2D surrogate instead of splines along the reservoir isentrope')
+
+    command = commands.add_parser('frozen', help='Print the frozen-flow solution')
+    _add_conditions(command)
+    command.add_argument('--area', default=AREA_DATA, help='Nozzle area profile')
+
+    commands.add_parser('sweep', help='Run sweep.py (all further arguments are passed on)', add_help=False)
+    commands.add_parser('contours', help='Run contours.py (all further arguments are passed on)', add_help=False)
+    commands.add_parser('service', help='Run service.py (all further arguments are passed on)', add_help=False)
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['sweep']:
+        import sweep
+        return sweep.main(argv[1:])
+    if argv[:1] == ['contours']:
+        import contours
+        return contours.main(argv[1:])
+    if argv[:1] == ['service']:
+        import service
+        return service.main(argv[1:])
+    args = parser.parse_args(argv)
+    if args.timing:
+        instrument.enable()
+
+    if args.command == 'run':
+        run(args.p0, args.T0, args.thermo, args.area, args.tabulated, args.direct,
+            None if args.no_plots else args.plots, args.output, report=args.report, center_tol=args.centers,
+            isentrope=not args.no_isentrope, sampling='adaptive' if args.adaptive else 'uniform')
+        print('Completed.')
+    elif args.command == 'reservoir':
+        with instrument.stage('tables'):
+            df = load_thermo(args.thermo)
+        with instrument.stage('reservoir'):
+            h0, s0 = reservoir_state(args.p0, args.T0, df)
+        print(f'h0 = {h0:.10g} J/kg\ns0 = {s0:.10g} J/(kg K)')
+    elif args.command == 'sonic':
+        with instrument.stage('tables'):
+            df = load_thermo(args.thermo)
+        with instrument.stage('reservoir'):
+            h0, s0 = reservoir_state(args.p0, args.T0, df)
+        with instrument.stage('surrogate'):
+            surrogate = build_surrogate(df, args.tabulated, args.centers, (s0, h0))
+        if not args.no_isentrope:
+            from thermo import construct_isentrope_surrogate
+            surrogate = construct_isentrope_surrogate(surrogate, s0, h0)
+        with instrument.stage('sonic'):
+            sonic = sonic_state(s0, h0, surrogate)
+        print(f'h0 = {h0:.10g} J/kg\ns0 = {s0:.10g} J/(kg K)')
+        for name, value in sonic.items():
+            print(f'{name} = {float(value):.10g}')
+    elif args.command == 'frozen':
+        with instrument.stage('frozen'):
+            h, u, rho, p, T, M, x = solve_frozen(args.p0, args.T0, args.area)
+        print('\t'.join(OUTPUT_HEADERS))
+        for row in zip(x, h, u, rho, p, T, M):
+            print('\t'.join(f'{value:.10g}' for value in row))
+
+    if args.timing:
+        instrument.print_report()
+
+
+if __name__ == '__main__':
+    main()
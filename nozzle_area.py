@@ -11,13 +11,19 @@ The full license text is available in the LICENSE file in the project root.
 import pandas as pd
 import numpy as np
 
+from binary_table import load_table, TABLE_CACHE_DIR
 
-def load_area_data(file_path):
-    # Load the area variation data from file
-    area = pd.read_csv(file_path, sep='\\s+', header=None, names=['x', 'A'])
+
+def load_area_data(file_path, cache_dir=TABLE_CACHE_DIR):
+    # Load the area variation data from file (through its memory-mapped binary copy after the first load)
+    area = load_table(file_path, _read_area_text, ('x', 'A'), cache_dir)
     return area
 
 
+def _read_area_text(file_path):
+    return pd.read_csv(file_path, sep='\\s+', header=None, names=['x', 'A'])
+
+
 def find_astar(df):
     # Find the location and value of A*
     idx_min = df['A'].idxmin()
@@ -26,6 +32,65 @@ def find_astar(df):
     return x_star, A_star
 
 
+def find_throat(x, A):
+    """
+    Locates the throat of one or many area profiles to sub-grid accuracy.
+
+    The parabola through the smallest-area row and its two neighbours gives the throat as its
+    vertex, so the result does not snap to the station spacing. A minimum at either end of a
+    profile is returned as that row.
+
+    Args:
+    - x: Positions, shape (N,) or (profiles, N), or broadcastable against A.
+    - A: Areas, shape (N,) or (profiles, N).
+
+    Returns:
+    - x_star, A_star and the index of the smallest-area row, each with the leading shape of A.
+    """
+    A = np.asarray(A, dtype=np.float64)
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), A.shape)
+    index = np.argmin(A, axis=-1)
+    inner = np.clip(index, 1, A.shape[-1] - 2)
+    x0, x1, x2 = (np.take_along_axis(x, (inner + k)[..., np.newaxis], -1)[..., 0] for k in (-1, 0, 1))
+    A0, A1, A2 = (np.take_along_axis(A, (inner + k)[..., np.newaxis], -1)[..., 0] for k in (-1, 0, 1))
+
+    # Vertex of the parabola through (x0, A0), (x1, A1), (x2, A2)
+    p, q = (x1 - x0) * (A1 - A2), (x1 - x2) * (A1 - A0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_vertex = x1 - 0.5 * ((x1 - x0) * p - (x1 - x2) * q) / (p - q)
+        curvature = ((A2 - A1) / (x2 - x1) - (A1 - A0) / (x1 - x0)) / (x2 - x0)
+        A_vertex = A1 - curvature * (x_vertex - x1)**2
+
+    interior = (index == inner) & (curvature > 0) & np.isfinite(x_vertex)
+    row_x = np.take_along_axis(x, index[..., np.newaxis], -1)[..., 0]
+    row_A = np.take_along_axis(A, index[..., np.newaxis], -1)[..., 0]
+    return np.where(interior, x_vertex, row_x)[()], np.where(interior, A_vertex, row_A)[()], index[()]
+
+
+def parabolic_contour(x, x_throat, A_star, A_inlet, A_exit):
+    """
+    Parametric nozzle contour: the area rises quadratically from the throat to the inlet and to the exit.
+
+    Array-valued parameters describe a family of contours, sampled at the same positions.
+
+    Args:
+    - x: Positions (N,); the inlet is x[0] and the exit x[-1].
+    - x_throat: Throat position, scalar or array.
+    - A_star: Throat area, scalar or array.
+    - A_inlet: Inlet area, scalar or array.
+    - A_exit: Exit area, scalar or array.
+
+    Returns:
+    - Areas with shape (broadcast shape of the parameters) + (N,).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    x_throat, A_star, A_inlet, A_exit = (np.asarray(value, dtype=np.float64)[..., np.newaxis]
+                                         for value in (x_throat, A_star, A_inlet, A_exit))
+    upstream = ((x - x_throat) / (x[0] - x_throat))**2
+    downstream = ((x - x_throat) / (x[-1] - x_throat))**2
+    return np.where(x < x_throat, A_star + (A_inlet - A_star) * upstream, A_star + (A_exit - A_star) * downstream)
+
+
 def find_closest_index(array, value):
     """
     Find the index of the entry in 'array' that is closest to the 'value'.
@@ -40,3 +105,76 @@ def find_closest_index(array, value):
     array = np.asarray(array)  # Ensure input is converted to a numpy array
     index = np.argmin(np.abs(array - value))  # Find the index of the smallest difference
     return index
+
+
+class AreaIndex:
+    """
+    Precomputed lookup of the position x at which the nozzle has a given area.
+
+    The profile is split at the throat into its converging and diverging branches, each stored
+    sorted by area, so lookups are O(log N) binary searches. Positions can be snapped to the
+    nearest row of the profile, interpolated linearly, or interpolated with a monotone cubic
+    (PCHIP) spline of x(A). Branches that are not strictly monotone are replaced by their
+    monotone envelope.
+    """
+
+    def __init__(self, x, A, index_star=None):
+        x = np.asarray(x, dtype=np.float64)
+        A = np.asarray(A, dtype=np.float64)
+        if index_star is None:
+            index_star = int(np.argmin(A))
+        self.x_star = x[index_star]
+        self.A_star = A[index_star]
+
+        rows = np.arange(len(A))
+        self.converging = _AreaBranch(x, A, rows[:index_star + 1][::-1])
+        self.diverging = _AreaBranch(x, A, rows[index_star:])
+        # Nearest-row snapping searches the converging branch without the throat row
+        self.converging_rows = _AreaBranch(x, A, rows[:index_star][::-1]) if index_star > 0 else self.converging
+
+    def position(self, area, supersonic, method='linear'):
+        """
+        Maps areas to positions along the nozzle.
+
+        Args:
+        - area: Array of areas.
+        - supersonic: Boolean array (or scalar), True for points on the diverging branch.
+        - method: 'linear' or 'spline' for a continuous x, 'nearest' to snap to the closest profile row.
+
+        Returns:
+        - Array of x positions with the shape of 'area'. Areas outside a branch are clamped to its ends.
+        """
+        area = np.asarray(area, dtype=np.float64)
+        supersonic = np.broadcast_to(supersonic, area.shape)
+        subsonic_branch = self.converging_rows if method == 'nearest' else self.converging
+        x = np.empty(area.shape)
+        x[~supersonic] = subsonic_branch.position(area[~supersonic], method)
+        x[supersonic] = self.diverging.position(area[supersonic], method)
+        return x
+
+
+class _AreaBranch:
+    # One monotone branch of the area profile, stored with increasing area
+
+    def __init__(self, x, A, rows):
+        self.x = x[rows]
+        self.A = np.maximum.accumulate(A[rows])  # Monotone envelope
+        self.strict = np.concatenate(([True], np.diff(self.A) > 0))  # Rows usable for interpolation
+        self._spline = None
+
+    def position(self, area, method):
+        if method == 'nearest':
+            right = np.clip(np.searchsorted(self.A, area), 1, len(self.A) - 1) if len(self.A) > 1 \
+                else np.zeros(area.shape, dtype=int)
+            left = np.maximum(right - 1, 0)
+            closest = np.where(np.abs(self.A[left] - area) <= np.abs(self.A[right] - area), left, right)
+            return self.x[closest]
+        A, x = self.A[self.strict], self.x[self.strict]
+        if method == 'linear' or len(A) < 3:
+            return np.interp(area, A, x)  # Binary search plus linear interpolation
+        if method == 'spline':
+            if self._spline is None:
+                from scipy.interpolate import PchipInterpolator  # Only needed for method='spline'
+                self._spline = PchipInterpolator(A, x, extrapolate=False)
+            return self._spline(np.clip(area, A[0], A[-1]))
+        raise ValueError(f"unknown placement method '{method}'")
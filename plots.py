@@ -1,135 +1,157 @@
-import matplotlib.pyplot as plt
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Property panels of a solution (enthalpy, velocity, density, pressure, temperature, Mach number, x)
+# Each entry: index in the solution, title, y-axis label, file name
+PANELS = {
+    'enthalpy': (0, 'Position (m) vs. Enthalpy (J/kg)', r'Enthalpy $h$ (J/kg)', 'enthalpy_graph.png'),
+    'velocity': (1, 'Position (m) vs. Velocity (m/s)', r'Fluid Velocity $u$ (m/s)', 'velocity_graph.png'),
+    'density': (2, r'Position (m) vs. Density (kg/$m^3$)', r'Density $\rho$ (kg/$m^3$)', 'density_graph.png'),
+    'pressure': (3, 'Position (m) vs. Pressure (Pa)', 'Fluid Pressure $p$ (Pa)', 'pressure_graph.png'),
+    'temperature': (4, 'Position (m) vs. Temperature (K)', 'Temperature $T$ (K)', 'temperature_graph.png'),
+    'mach': (5, r'Position (m) vs. Mach Number', r'Mach Number $M$', 'mach_graph.png'),
+}
+
+# Throat position and plotted x range of the nozzle
+X_THROAT = 0
+X_RANGE = (-0.03, 0.055)
+
+# One figure per process, cleared and reused for every panel (never registered with pyplot)
+_figure = None
+
+
+def _get_figure():
+    global _figure
+    if _figure is None:
+        _figure = Figure()
+        FigureCanvasAgg(_figure)
+    _figure.clear()
+    return _figure
+
+
+def _decorate(ax, title, ylabel, legend):
+    # Throat line, regime shading and labels shared by every panel
+    ax.axvline(x=X_THROAT, color='red', linestyle='--', label='Throat')
+    ax.axvspan(X_RANGE[0], X_THROAT, color='blue', alpha=0.2, label='Subsonic Regime')
+    ax.axvspan(X_THROAT, X_RANGE[1], color='green', alpha=0.2, label='Supersonic Regime')
+    ax.set_xlim(*X_RANGE)
+    ax.set_title(title)
+    ax.set_xlabel(r'Position $x$ along the nozzle (m)')
+    ax.set_ylabel(ylabel)
+    ax.grid()
+    if legend:
+        handles, labels = ax.get_legend_handles_labels()
+        order = ['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime']
+        ax.legend([handles[labels.index(name)] for name in order if name in labels],
+                  [name for name in order if name in labels])
+
+
+def _save(fig, path):
+    fig.savefig(path)
+    fig.clear()
+
+
+def render_panel(name, LTE, frozen=None, out_dir='graphs'):
+    """
+    Renders one property panel to '<out_dir>/<name>_graph.png'.
+
+    Args:
+    - name: Key of PANELS.
+    - LTE: (x, values) of the equilibrium solution.
+    - frozen: (x, values) of the frozen-flow solution, or None.
+    - out_dir: Output directory.
+    """
+    _, title, ylabel, filename = PANELS[name]
+    fig = _get_figure()
+    ax = fig.add_subplot()
+    ax.plot(*LTE, label='LTE Indirect Method')
+    if frozen is not None:
+        ax.plot(*frozen, linestyle='--', linewidth=2, label='Frozen Flow')
+    _decorate(ax, title, ylabel, legend=True)
+    _save(fig, os.path.abspath(os.path.join(out_dir, filename)))
+
+
+def render_solution(solution, frozen=None, area=None, out_dir='graphs', panels=tuple(PANELS)):
+    """
+    Renders every property panel of a nozzle solution (and optionally the area profile).
+
+    Args:
+    - solution: solution.NozzleSolution (or a (enthalpy, velocity, density, pressure, temperature,
+      Mach number, x) sequence of arrays), as returned by process_nozzle_indirect_method.
+    - frozen: The same for the frozen-flow solution, or None.
+    - area: (x, A) of the area profile, or None to skip the area panel.
+    - out_dir: Output directory (created if needed).
+    - panels: Names of the panels to render.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for name in panels:
+        index = PANELS[name][0]
+        render_panel(name, (solution[6], solution[index]),
+                     None if frozen is None else (frozen[6], frozen[index]), out_dir)
+    if area is not None:
+        render_area(*area, out_dir=out_dir)
+
+
+def render_area(x, area, out_dir='graphs'):
+    fig = _get_figure()
+    ax = fig.add_subplot()
+    ax.plot(x, area)
+    _decorate(ax, r'Position (m) vs. Area ($m^2$)', r'Nozzle Area ($m^2$)', legend=False)
+    _save(fig, os.path.abspath(os.path.join(out_dir, 'area_graph.png')))
+
+
+def _render_case(args):
+    render_solution(*args)
+
+
+def render_cases(solutions, out_dirs, frozen=None, area=None, workers=None):
+    """
+    Renders many solutions, one output directory each, optionally in parallel worker processes.
+
+    Args:
+    - solutions: List of solutions (see render_solution).
+    - out_dirs: Output directory of each solution.
+    - frozen: List of frozen-flow solutions (or None).
+    - area: (x, A) of the area profile, rendered into every directory, or None.
+    - workers: Number of worker processes (None or 1 renders in this process).
+    """
+    frozen = frozen if frozen is not None else [None] * len(solutions)
+    cases = [(solution, frozen_solution, area, out_dir)
+             for solution, frozen_solution, out_dir in zip(solutions, frozen, out_dirs)]
+    if workers is None or workers == 1:
+        for case in cases:
+            _render_case(case)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_case, cases))
 
 
 def plot_enthalpy(LTE, frozen):
-    x_lte, enthalpy_lte = LTE
-    x_fr, enthalpy_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, enthalpy_lte)
-    plt.plot(x_fr, enthalpy_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title('Position (m) vs. Enthalpy (J/kg)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel(r'Enthalpy $h$ (J/kg)')
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    plt.grid()
-    path = os.path.abspath('graphs/enthalpy_graph.png')
-    plt.savefig(path)
+    render_panel('enthalpy', LTE, frozen)
 
 
 def plot_area(x, area):
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x, area)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title(r'Position (m) vs. Area ($m^2$)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel(r'Nozzle Area ($m^2$)')
-    plt.grid()
-    path = os.path.abspath('graphs/area_graph.png')
-    plt.savefig(path)
+    render_area(x, area)
 
 
 def plot_velocity(LTE, frozen):
-    x_lte, velocity_lte = LTE
-    x_fr, velocity_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, velocity_lte)
-    plt.plot(x_fr, velocity_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title('Position (m) vs. Velocity (m/s)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel(r'Fluid Velocity $u$ (m/s)')
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    plt.grid()
-    path = os.path.abspath('graphs/velocity_graph.png')
-    plt.savefig(path)
+    render_panel('velocity', LTE, frozen)
 
 
 def plot_pressure(LTE, frozen):
-    x_lte, pressure_lte = LTE
-    x_fr, pressure_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, pressure_lte)
-    plt.plot(x_fr, pressure_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title('Position (m) vs. Pressure (Pa)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel('Fluid Pressure $p$ (Pa)')
-    plt.grid()
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    path = os.path.abspath('graphs/pressure_graph.png')
-    plt.savefig(path)
+    render_panel('pressure', LTE, frozen)
 
 
 def plot_temperature(LTE, frozen):
-    x_lte, temperature_lte = LTE
-    x_fr, temperature_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, temperature_lte)
-    plt.plot(x_fr, temperature_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title('Position (m) vs. Temperature (K)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel('Temperature $T$ (K)')
-    plt.grid()
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    path = os.path.abspath('graphs/temperature_graph.png')
-    plt.savefig(path)
+    render_panel('temperature', LTE, frozen)
 
 
 def plot_density(LTE, frozen):
-    x_lte, density_lte = LTE
-    x_fr, density_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, density_lte)
-    plt.plot(x_fr, density_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title(r'Position (m) vs. Pressure (kg/$m^3$)')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel(r'Density $rho$ (kg/$m^3$)')
-    plt.grid()
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    path = os.path.abspath('graphs/density_graph.png')
-    plt.savefig(path)
+    render_panel('density', LTE, frozen)
 
 
 def plot_mach_number(LTE, frozen):
-    x_lte, mach_lte = LTE
-    x_fr, mach_fr = frozen
-    plt.figure()
-    plt.axvline(x=0, color='red', linestyle='--', label="Throat (M=1)")
-    plt.plot(x_lte, mach_lte)
-    plt.plot(x_fr, mach_fr, linestyle='--', linewidth=2)
-    plt.axvspan(-0.03, 0, color='blue', alpha=0.2, label="Subsonic Region")
-    plt.axvspan(0, 0.055, color='green', alpha=0.2, label="Supersonic Region")
-    plt.xlim(-0.03, 0.055)
-    plt.title(r'Position (m) vs. Mach Number')
-    plt.xlabel(r'Position $x$ along the nozzle (m)')
-    plt.ylabel(r'Mach Number $M$')
-    plt.grid()
-    plt.legend(['Throat', 'LTE Indirect Method', 'Frozen Flow', 'Subsonic Regime', 'Supersonic Regime'])
-    path = os.path.abspath('graphs/mach_graph.png')
-    plt.savefig(path)
-
-
-
-
+    render_panel('mach', LTE, frozen)
@@ -9,28 +9,45 @@ The full license text is available in the LICENSE file in the project root.
 """
 
 import numpy as np
-from scipy.interpolate import LinearNDInterpolator
+from scipy.interpolate import LinearNDInterpolator, RegularGridInterpolator
 
+import instrument
 
-# Creates interpolators for thermodynamic properties for the reservoir
+
+# Creates an interpolator for the thermodynamic properties of the reservoir
 def create_reservoir_interpolator(df):
+    """
+    Creates one interpolator returning enthalpy and entropy (per unit mass) together at (T, p).
+
+    Tables that form a tensor grid in (T, p), such as output.dat, use a RegularGridInterpolator
+    (no triangulation). Scattered tables fall back to a single Delaunay triangulation shared by
+    both properties. Points outside the table give NaN.
+    """
     temperature = df['T'].values
     pressure = df['p'].values
-    enthalpy = df['Enthalpy'].values  # per unit mass
-    entropy = df['Entropy'].values  # per unit mass
+    values = np.column_stack((df['Enthalpy'].values, df['Entropy'].values))  # per unit mass
 
-    points = np.column_stack((temperature, pressure))  # Combines T and P into an array of 2D coordinates
+    # Detects a structured grid: every (T, p) combination of the unique values appears exactly once
+    T_grid, T_index = np.unique(temperature, return_inverse=True)
+    p_grid, p_index = np.unique(pressure, return_inverse=True)
+    if len(T_grid) > 1 and len(p_grid) > 1 and len(T_grid) * len(p_grid) == len(values):
+        grid = np.full((len(T_grid), len(p_grid), 2), np.nan)
+        grid[T_index, p_index] = values
+        if not np.isnan(grid).any():
+            return RegularGridInterpolator((T_grid, p_grid), grid, bounds_error=False, fill_value=np.nan)
 
-    enthalpy_interpolator = LinearNDInterpolator(points, enthalpy)  # Linear interpolation of enthalpy
-    entropy_interpolator = LinearNDInterpolator(points, entropy)  # Linear interpolation of entropy
-
-    return enthalpy_interpolator, entropy_interpolator
+    points = np.column_stack((temperature, pressure))  # Combines T and P into an array of 2D coordinates
+    return LinearNDInterpolator(points, values)  # Linear interpolation on one shared triangulation
 
 
 # Computes enthalpy and entropy from pressure and temperature
-def get_reservoir_h_and_s(p, T, enthalpy_interpolator, entropy_interpolator):
+def get_reservoir_h_and_s(p, T, reservoir_interpolator):
     # Finding enthalpy and entropy using linear interpolation based on the thermodynamic state specified by p and T
-    h = enthalpy_interpolator(T, p)
-    s = entropy_interpolator(T, p)
+    T, p = np.broadcast_arrays(np.asarray(T, dtype=np.float64), np.asarray(p, dtype=np.float64))
+    points = np.column_stack((T.ravel(), p.ravel()))
+    instrument.count('reservoir', len(points))
+    values = reservoir_interpolator(points)
+    h = values[:, 0].reshape(T.shape)[()]
+    s = values[:, 1].reshape(T.shape)[()]
 
     return h, s  # Returns enthalpy and entropy, per unit mass
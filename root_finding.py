@@ -0,0 +1,121 @@
+import numpy as np
+
+
+def find_roots_bracketed(func, low, high, rtol=1e-10, max_iterations=100, ftol=0.0):
+    """
+    Vectorized bracketed root finder (Illinois variant of regula falsi).
+
+    Every entry is solved independently but all unconverged entries are evaluated together,
+    so each iteration costs a single call of 'func'. The root always stays inside its bracket,
+    so convergence is guaranteed for continuous functions that change sign over [low, high].
+
+    Args:
+    - func: Function func(x, index) returning the residuals at points x, where index holds the
+      positions of those points in the full batch (to select per-entry parameters).
+    - low: Array of lower bracket ends.
+    - high: Array of upper bracket ends, func(low) and func(high) must have opposite signs.
+    - rtol: Relative tolerance on the bracket width or on the last step.
+    - max_iterations: Maximum number of iterations.
+    - ftol: Absolute tolerance on the residual; entries with |func| <= ftol are converged.
+
+    Returns:
+    - root: Array of roots.
+    - iterations: Number of iterations (batched func calls after the bracket evaluation).
+    - converged: Boolean array, False where the tolerance was not met or the bracket was invalid.
+    """
+    a, b = np.broadcast_arrays(np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64))
+    shape = a.shape
+    a, b = a.ravel().copy(), b.ravel().copy()
+    index = np.arange(a.size)
+    fa, fb = func(a, index), func(b, index)
+
+    root = np.where(np.abs(fa) < np.abs(fb), a, b)
+    converged = (np.abs(fa) <= ftol) | (np.abs(fb) <= ftol)
+    valid = np.isfinite(fa) & np.isfinite(fb) & (np.sign(fa) != np.sign(fb))
+    active = np.flatnonzero(valid & ~converged)
+    a, b, fa, fb = a[active], b[active], fa[active], fb[active]
+
+    iterations = 0
+    while active.size and iterations < max_iterations:
+        iterations += 1
+        c = b - fb * (b - a) / (fb - fa)
+        c = np.where((c - a) * (c - b) < 0, c, (a + b) / 2)  # Bisect if the secant leaves the bracket
+        fc = func(c, active)
+
+        # Keep the sign change inside [a, b]; halve the stale end's residual (Illinois step)
+        flip = np.sign(fc) != np.sign(fb)
+        a, fa = np.where(flip, b, a), np.where(flip, fb, fa / 2)
+        b, fb = c, fc
+
+        # Converged once the residual, the bracket or the last secant step is within tolerance
+        done = (np.abs(fc) <= ftol) | (np.abs(b - a) <= rtol * np.abs(c)) \
+            | (np.abs(c - root[active]) <= rtol * np.abs(c))
+        root[active] = c
+        converged[active[done]] = True
+        keep = ~done
+        active, a, b, fa, fb = active[keep], a[keep], b[keep], fa[keep], fb[keep]
+
+    return root.reshape(shape), iterations, converged.reshape(shape)
+
+
+def find_roots_newton(func, low, high, rtol=1e-10, max_iterations=100, ftol=0.0):
+    """
+    Vectorized safeguarded Newton root finder.
+
+    Like find_roots_bracketed, but 'func' also returns the derivative, so each iteration takes a
+    Newton step (quadratic convergence near the root). The bracket is kept and updated from the
+    sign of every residual; a step that leaves the bracket, or a zero derivative, falls back to
+    bisection, so convergence is still guaranteed for continuous functions with a sign change.
+
+    Args:
+    - func: Function func(x, index) returning the residuals at points x and their derivatives with
+      respect to x, where index holds the positions of those points in the full batch.
+    - low: Array of lower bracket ends.
+    - high: Array of upper bracket ends, func(low) and func(high) must have opposite signs.
+    - rtol: Relative tolerance on the last step or on the bracket width.
+    - max_iterations: Maximum number of iterations.
+    - ftol: Absolute tolerance on the residual; entries with |func| <= ftol are converged.
+
+    Returns:
+    - root: Array of roots.
+    - iterations: Number of iterations (batched func calls after the bracket evaluation).
+    - converged: Boolean array, False where the tolerance was not met or the bracket was invalid.
+    """
+    a, b = np.broadcast_arrays(np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64))
+    shape = a.shape
+    a, b = a.ravel().copy(), b.ravel().copy()
+    index = np.arange(a.size)
+    (fa, da), (fb, db) = func(a, index), func(b, index)
+
+    # Start from the end with the smaller residual
+    start_a = np.abs(fa) < np.abs(fb)
+    root = np.where(start_a, a, b)
+    converged = (np.abs(fa) <= ftol) | (np.abs(fb) <= ftol)
+    valid = np.isfinite(fa) & np.isfinite(fb) & (np.sign(fa) != np.sign(fb))
+    active = np.flatnonzero(valid & ~converged)
+    a, b, fa = a[active], b[active], fa[active]
+    x = root[active]
+    fx = np.where(start_a[active], fa, fb[active])
+    dx = np.where(start_a[active], da[active], db[active])
+
+    iterations = 0
+    while active.size and iterations < max_iterations:
+        iterations += 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = x - fx / dx
+        c = np.where(np.isfinite(c) & ((c - a) * (c - b) < 0), c, (a + b) / 2)  # Bisect if Newton leaves the bracket
+        fc, dc = func(c, active)
+
+        # Keep the sign change inside [a, b]
+        same = np.sign(fc) == np.sign(fa)
+        a, fa = np.where(same, c, a), np.where(same, fc, fa)
+        b = np.where(same, b, c)
+
+        done = (np.abs(fc) <= ftol) | (np.abs(c - x) <= rtol * np.abs(c)) | (np.abs(b - a) <= rtol * np.abs(c))
+        x, fx, dx = c, fc, dc
+        root[active] = c
+        converged[active[done]] = True
+        keep = ~done
+        active, a, b, fa, x, fx, dx = active[keep], a[keep], b[keep], fa[keep], x[keep], fx[keep], dx[keep]
+
+    return root.reshape(shape), iterations, converged.reshape(shape)
@@ -0,0 +1,356 @@
+"""
+Resident nozzle query service.
+
+The thermodynamic table, the fitted surrogate, the reservoir interpolator and the area profile
+are loaded once when the service starts, so queries only pay for the evaluation. Requests are
+JSON objects, one per line, over a Unix socket (default) or a localhost TCP port:
+
+    {"id": 1, "op": "reservoir", "p0": 5e6, "T0": 4500}
+    {"id": 2, "op": "sonic", "p0": 5e6, "T0": 4500}
+    {"id": 3, "op": "nozzle", "p0": 5e6, "T0": 4500, "method": "indirect"}
+    {"id": 4, "op": "frozen", "p0": 5e6, "T0": 4500}
+    {"id": 5, "op": "status"}
+
+Each response is one line, {"id": ..., "result": ...} or {"id": ..., "error": "..."}. Responses
+to the requests of one connection may arrive out of order. Requests of the same kind that arrive
+within a short window (from any connection) are answered by one vectorized evaluation (for
+'nozzle' with isentropes only the reservoir states; the sonic state and the stations of each case
+are solved on that case's own isentrope). A request that fails does not fail the others.
+
+    python service.py serve --socket /tmp/nozzle.sock
+    python service.py query '{"op": "sonic", "p0": 5e6, "T0": 4500}'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import nozzle
+
+SOCKET_PATH = '/tmp/nozzle.sock'
+BATCH_WINDOW = 0.002  # Seconds a batch waits for more requests after its first one
+MAX_BATCH = 256  # Largest number of requests evaluated together
+
+
+class NozzleModel:
+    """
+    The warm state of the service and the batched handlers of every operation.
+
+    Every handler takes a list of requests and returns one JSON-serializable result per request, or
+    the exception that request raised.
+    """
+
+    def __init__(self, thermo_file=nozzle.THERMO_DATA, area_file=nozzle.AREA_DATA, tabulated=False,
+                 center_tol=None, isentrope=True):
+        from reservoir import create_reservoir_interpolator
+        from nozzle_area import AreaIndex
+        self.df = nozzle.load_thermo(thermo_file)
+        self.surrogate = nozzle.build_surrogate(self.df, tabulated, center_tol)
+        self.reservoir_interpolator = create_reservoir_interpolator(self.df)
+        self.Area, self.A_x, self.A_star, self.index_star = nozzle.load_nozzle(area_file)
+        self.area_index = AreaIndex(self.Area['x'], self.A_x, self.index_star)
+        self.isentrope = isentrope
+
+    def reservoir(self, requests):
+        from reservoir import get_reservoir_h_and_s
+        p0, T0 = _conditions(requests)
+        h0, s0 = get_reservoir_h_and_s(p0, T0, self.reservoir_interpolator)
+        return h0, s0
+
+    def handle_reservoir(self, requests):
+        h0, s0 = self.reservoir(requests)
+        return [{'h0': h, 's0': s} for h, s in zip(h0.tolist(), s0.tolist())]
+
+    def sonic(self, requests):
+        from sonic import compute_hstar_sstar, compute_rho_star_astar_Fstar
+        h0, s0 = self.reservoir(requests)
+        h_star, s_star = compute_hstar_sstar(s0, h0, self.surrogate)
+        a_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, self.surrogate)
+        return h0, s0, {'h_star': h_star, 's_star': s_star, 'a_star': a_star, 'rho_star': rho_star,
+                        'F_rho_a_star': F_rho_a_star}
+
+    def handle_sonic(self, requests):
+        h0, s0, sonic = self.sonic(requests)
+        return [dict({'h0': h0[i], 's0': s0[i]}, **{name: value[i] for name, value in sonic.items()})
+                for i in range(len(requests))]
+
+    def handle_nozzle(self, requests):
+        # Reservoir states are batched. With isentropes, each case's sonic state and stations are solved
+        # one case at a time on its own isentrope (near the throat the stations are sensitive to any
+        # mismatch in F*, so the sonic state must come from the same splines); otherwise the sonic
+        # states are batched as well. A case that fails gets its exception, the others are still solved.
+        from thermo import construct_isentrope_surrogate
+        from indirect_method import process_nozzle_indirect_method
+        from direct_method import process_nozzle_direct_method
+        if self.isentrope:
+            h0, s0 = self.reservoir(requests)
+        else:
+            h0, s0, sonic = self.sonic(requests)
+        results = []
+        for i, request in enumerate(requests):
+            try:
+                surrogate = self.surrogate
+                if self.isentrope:
+                    surrogate = construct_isentrope_surrogate(surrogate, s0[i], h0[i])
+                    case = nozzle.sonic_state(s0[i], h0[i], surrogate)
+                else:
+                    case = {name: value[i] for name, value in sonic.items()}
+                if request.get('method', 'indirect') == 'direct':
+                    solution = process_nozzle_direct_method(s0[i], h0[i], self.Area, self.A_x, self.A_star,
+                                                            case['F_rho_a_star'], self.index_star, case['h_star'],
+                                                            surrogate)
+                else:
+                    solution = process_nozzle_indirect_method(s0[i], h0[i], self.Area, self.A_x, self.A_star,
+                                                              case['F_rho_a_star'], self.index_star, surrogate,
+                                                              self.area_index)
+                results.append(_columns(solution))
+            except Exception as error:
+                results.append(error)
+        return results
+
+    def handle_frozen(self, requests):
+        from frozen import process_nozzle_perfect_gas
+        p0, T0 = _conditions(requests)
+        solution = process_nozzle_perfect_gas(nozzle.GAMMA_FROZEN, nozzle.R_FROZEN, p0, T0, self.Area, self.A_x,
+                                              self.A_star, self.index_star)
+        # One row of the batched solution per request
+        return [_columns(solution.case(i)) for i in range(len(requests))]
+
+
+def _conditions(requests):
+    p0 = np.array([float(request['p0']) for request in requests])
+    T0 = np.array([float(request['T0']) for request in requests])
+    return p0, T0
+
+
+def _columns(solution):
+    return {name: solution[name].tolist() for name in nozzle.OUTPUT_COLUMNS}
+
+
+class _Batcher:
+    # Collects the requests of one operation and evaluates them together on the compute thread
+
+    def __init__(self, handler, executor, window, max_batch):
+        self.handler = handler
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(items) < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    items.append(self.queue.get_nowait())
+
+            self.batches += 1
+            self.requests += len(items)
+            requests = [request for request, _ in items]
+            try:
+                results = await loop.run_in_executor(self.executor, self.handler, requests)
+            except Exception:
+                # A vectorized evaluation failed as a whole: evaluate the requests one by one so the error
+                # only reaches the requests that cause it
+                results = await loop.run_in_executor(self.executor, self._each, requests)
+            for (_, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _each(self, requests):
+        results = []
+        for request in requests:
+            try:
+                results.extend(self.handler([request]))
+            except Exception as error:
+                results.append(error)
+        return results
+
+
+class NozzleService:
+    """
+    asyncio server answering JSON-lines requests from a NozzleModel, with micro-batching per operation.
+    """
+
+    OPERATIONS = ('reservoir', 'sonic', 'nozzle', 'frozen')
+
+    def __init__(self, model, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.started = time.time()
+
+    async def serve(self, socket_path=SOCKET_PATH, host=None, port=None, ready=None):
+        """
+        Serves until cancelled: on the Unix socket socket_path, or on host:port when port is given.
+        ready (an asyncio.Event) is set once the server accepts connections.
+        """
+        # One compute thread: NumPy releases the GIL, and the event loop stays free to collect requests
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batchers = {name: _Batcher(getattr(self.model, f'handle_{name}'), self.executor, self.window,
+                                        self.max_batch) for name in self.OPERATIONS}
+        tasks = [asyncio.create_task(batcher.run()) for batcher in self.batchers.values()]
+        if os.name == 'posix':  # Stop (and remove the socket) on SIGTERM as on Ctrl-C
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if port is not None:
+            server = await asyncio.start_server(self._connection, host or '127.0.0.1', port)
+        else:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self._connection, socket_path)
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False)
+            if port is None and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    async def _connection(self, reader, writer):
+        pending = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(self._respond(line, writer))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def _respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            operation = request.get('op')
+            if operation == 'status':
+                response = {'id': request_id, 'result': self.status()}
+            elif operation in self.batchers:
+                float(request['p0']), float(request['T0'])  # A malformed request fails alone, not its batch
+                response = {'id': request_id, 'result': await self.batchers[operation].submit(request)}
+            else:
+                raise ValueError(f"unknown op '{operation}'")
+        except Exception as error:
+            response = {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+    def status(self):
+        return {'uptime': time.time() - self.started,
+                'batches': {name: {'batches': batcher.batches, 'requests': batcher.requests}
+                            for name, batcher in self.batchers.items()}}
+
+
+def send(requests, socket_path=SOCKET_PATH, host=None, port=None, timeout=None):
+    """
+    Sends requests to a running service and returns the responses in request order (blocking client).
+
+    Args:
+    - requests: List of request dictionaries (ids are assigned here).
+    - socket_path: Unix socket of the service (ignored when port is given).
+    - host, port: TCP address of the service.
+    - timeout: Socket timeout in seconds.
+
+    Returns:
+    - List of response dictionaries, each with either 'result' or 'error'.
+    """
+    if port is not None:
+        connection = socket.create_connection((host or '127.0.0.1', port), timeout)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+    with connection, connection.makefile('rwb') as stream:
+        for i, request in enumerate(requests):
+            stream.write(json.dumps(dict(request, id=i)).encode() + b'\n')
+        stream.flush()
+        responses = {}
+        while len(responses) < len(requests):
+            line = stream.readline()
+            if not line:
+                raise ConnectionError('the service closed the connection')
+            response = json.loads(line)
+            responses[response['id']] = response
+    return [responses[i] for i in range(len(requests))]
+
+
+def query(requests, socket_path=SOCKET_PATH, host=None, port=None, timeout=None):
+    """
+    Like send, but returns the results; a request that failed raises RuntimeError with the service's message.
+    """
+    results = []
+    for response in send(requests, socket_path, host, port, timeout):
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        results.append(response['result'])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resident nozzle query service.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, description in (('serve', 'Start the service'), ('query', 'Send requests to a running service')):
+        command = commands.add_parser(name, help=description)
+        command.add_argument('--socket', default=SOCKET_PATH, help='Unix socket path')
+        command.add_argument('--port', type=int, help='Use localhost TCP on this port instead of the Unix socket')
+
+    command = commands.choices['serve']
+    command.add_argument('--thermo', default=nozzle.THERMO_DATA, help='Thermodynamic table')
+    command.add_argument('--area', default=nozzle.AREA_DATA, help='Nozzle area profile')
+    command.add_argument('--tabulated', action='store_true', help='Use the bicubic table of the surrogate')
+    command.add_argument('--no-isentrope', action='store_true',
+                         help='Query the 2D surrogate instead of splines along each isentrope')
+    command.add_argument('--window', type=float, default=BATCH_WINDOW * 1e3,
+                         help='Milliseconds a batch waits for more requests')
+    command.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Largest batch')
+    commands.choices['query'].add_argument('requests', nargs='+', help='JSON request objects')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        model = NozzleModel(args.thermo, args.area, args.tabulated, isentrope=not args.no_isentrope)
+        service = NozzleService(model, args.window / 1e3, args.max_batch)
+        print(f'Serving on {f"127.0.0.1:{args.port}" if args.port is not None else args.socket}', flush=True)
+        try:
+            asyncio.run(service.serve(args.socket, port=args.port))
+        except (KeyboardInterrupt, asyncio.CancelledError):  # Ctrl-C or SIGTERM
+            pass
+    else:
+        for response in send([json.loads(request) for request in args.requests], args.socket, port=args.port):
+            print(json.dumps(response.get('result', response)))
+
+
+if __name__ == '__main__':
+    main()
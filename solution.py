@@ -0,0 +1,101 @@
+"""
+Struct-of-arrays container of nozzle solutions.
+"""
+
+import numpy as np
+
+# Columns of a solution, in the order of the solvers' historical 7-tuple (h, u, rho, p, T, M, x)
+COLUMNS = ('h', 'u', 'rho', 'p', 'T', 'M', 'x')
+UNITS = {'h': 'J/kg', 'u': 'm/s', 'rho': 'kg/m^3', 'p': 'Pa', 'T': 'K', 'M': '-', 'x': 'm'}
+
+
+class NozzleSolution:
+    """
+    One (or a batch of) nozzle solution(s) stored as a single float64 block of shape (7, ..., stations).
+
+    Each property (h, u, rho, p, T, M, x, see COLUMNS and UNITS) is a contiguous row view of the
+    block, so solvers write their results straight into it and writers, plots and aggregations
+    read the views without copying. The container still unpacks, iterates and indexes like the
+    7-tuple the solvers used to return: h, u, rho, p, T, M, x = solution; solution[6] is x.
+
+    Attributes:
+    - data: The (7, ..., stations) block.
+    - metadata: Dictionary describing the solution (method, reservoir state, ...).
+    """
+
+    __slots__ = ('data', 'metadata')
+
+    def __init__(self, data, metadata=None):
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim < 2 or data.shape[0] != len(COLUMNS):
+            raise ValueError(f'expected a ({len(COLUMNS)}, ..., stations) array, got shape {data.shape}')
+        self.data = data
+        self.metadata = dict(metadata or {})
+
+    @classmethod
+    def empty(cls, shape, **metadata):
+        """
+        Allocates an unfilled solution; 'shape' is the number of stations, or (..., stations) for a batch.
+        """
+        return cls(np.empty((len(COLUMNS),) + tuple(np.atleast_1d(shape))), metadata)
+
+    @classmethod
+    def concatenate(cls, solutions, **metadata):
+        """
+        Joins solutions along the station axis (one copy of all blocks).
+        """
+        return cls(np.concatenate([solution.data for solution in solutions], axis=-1), metadata)
+
+    def split(self, indices_or_sections):
+        """
+        Splits along the station axis into solutions that are views of this one (see numpy.split).
+        """
+        return [NozzleSolution(part, self.metadata) for part in np.split(self.data, indices_or_sections, axis=-1)]
+
+    def case(self, index):
+        """
+        One solution of a batch (a view); 'index' is an int, or a tuple for multi-dimensional batches.
+        """
+        return NozzleSolution(self.data[(slice(None),) + np.index_exp[index]], self.metadata)
+
+    @property
+    def stations(self):
+        return self.data.shape[-1]
+
+    def columns(self, names=COLUMNS):
+        """
+        Tuple of the named column views (e.g. ('x', 'h', ...) for the output table order).
+        """
+        return tuple(self.data[COLUMNS.index(name)] for name in names)
+
+    def as_dict(self):
+        return dict(zip(COLUMNS, self.data))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[COLUMNS.index(key)]
+        if isinstance(key, slice):
+            return tuple(self.data[key])
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(COLUMNS)
+
+    def __repr__(self):
+        return f'NozzleSolution(shape={self.data.shape[1:]}, metadata={self.metadata})'
+
+
+def _column(index, name):
+    def get(self):
+        return self.data[index]
+
+    def set(self, value):
+        self.data[index] = value
+    return property(get, set, doc=f'{name} ({UNITS[name]})')
+
+
+for _index, _name in enumerate(COLUMNS):
+    setattr(NozzleSolution, _name, _column(_index, _name))
@@ -10,50 +10,75 @@ The full license text is available in the LICENSE file in the project root.
 
 import numpy as np
 
-from scipy.optimize import fsolve
+import instrument
+from root_finding import find_roots_newton
 from thermo import *
 
 
 # Computes enthalpy h_star and entropy s_star at the throat
-def compute_hstar_sstar(s0, h0, rbf_interpolator_speed):
-    # Defines the equation/function representing the constraints at the throat of the nozzle
-    def throat_condition(h_star):
-        # Converting to natural log entropy-enthalpy inputs
-        log_inputs = np.log([s0, h_star[0]]).reshape(1, -1)  # 2D array
+def compute_hstar_sstar(s0, h0, surrogate, rtol=1e-10, max_iterations=100):
+    """
+    Solves the throat condition u = a for one or many reservoir states at once.
+
+    Args:
+    - s0: Reservoir entropy, scalar or array.
+    - h0: Reservoir enthalpy, scalar or array broadcastable against s0.
+    - surrogate: Thermodynamic surrogate returning SpeedOfSound.
+    - rtol: Relative tolerance on h_star.
+    - max_iterations: Maximum number of batched surrogate evaluations.
+
+    Returns:
+    - h_star, s_star with the broadcast shape of s0 and h0 (NaN where the solve did not converge).
+    """
+    s0, h0 = np.broadcast_arrays(np.asarray(s0, dtype=np.float64), np.asarray(h0, dtype=np.float64))
+    s0_flat, h0_flat = s0.ravel(), h0.ravel()
 
-        # Finding the speed of sound associated with the enthalpy and entropy
-        log_a = rbf_interpolator_speed(log_inputs)  # Interpolator returns log(a)
-        a = np.exp(log_a[0])  # Convert back to physical values
+    # Defines the equation/function representing the constraints at the throat of the nozzle
+    def throat_condition(h_star, index, gradient=False):
+        # Finding the speed of sound associated with the enthalpy and entropy (one batched evaluation)
+        properties = surrogate(s0_flat[index], h_star, gradient=gradient)
+        a = properties['SpeedOfSound']
 
         # Computing the velocity according to the energy condition
-        u = (2 * (h0 - h_star[0])) ** 0.5
+        u = np.sqrt(2 * np.maximum(h0_flat[index] - h_star, 0))
 
         # Returns the difference between speed of sound and velocity of the fluid
         # The difference is 0 if it satisfies the throat condition (and is at the throat of the nozzle)
-        return u - a
-
-    # Solving for the enthalpy and entropy at the throat
-    guess = np.array([h0 * 0.05])  # Initial guess for h_star
-    h_star = fsolve(throat_condition, guess)[0]  # Solving the throat condition to find the enthalpy at the throat
-    s_star = s0  # Isentropic flow condition
+        if not gradient:
+            return u - a
+
+        # d(u - a)/dh for the Newton steps, du/dh = -1/u
+        with np.errstate(divide='ignore'):
+            return u - a, -1 / u - properties['dSpeedOfSound_dh']
+
+    # Bracketing the throat enthalpy: the flow is at rest at h0 (u < a), and u > a once enough enthalpy is converted
+    high = h0_flat.copy()
+    low = 0.5 * h0_flat
+    below = np.arange(low.size)
+    for _ in range(8):
+        below = below[throat_condition(low[below], below) <= 0]
+        if below.size == 0:
+            break
+        low[below] *= 0.5
+
+    # Solving the throat condition to find the enthalpy at the throat
+    h_star, iterations, converged = find_roots_newton(lambda h, index: throat_condition(h, index, gradient=True),
+                                                      low, high, rtol, max_iterations)
+    instrument.solver('sonic', iterations, converged)
+    h_star = np.where(converged, h_star, np.nan).reshape(s0.shape)[()]
+    s_star = s0[()]  # Isentropic flow condition
     return h_star, s_star
 
 
 # Computes a_star, rho_star, and F_star = a_star * rho_star at the throat
-def compute_rho_star_astar_Fstar(s0, h_star, rbf_interpolator_rho, rbf_interpolator_speed):
-    # Converting to natural log entropy-enthalpy inputs
-    log_inputs = np.log([s0, h_star]).reshape(1, -1)  # 2D array
-
-    # Using interpolation to find the density and speed of sound at the nozzle throat
-    log_rho_star = rbf_interpolator_rho(log_inputs)  # Log of density
-    log_a_star = rbf_interpolator_speed(log_inputs)  # Log of speed of sound
-
-    # Converting back to physical values
-    rho_star = np.exp(log_rho_star)
-    a_star = np.exp(log_a_star)
+def compute_rho_star_astar_Fstar(s0, h_star, surrogate):
+    # Using the surrogate to find the density and speed of sound at the nozzle throat
+    # (one batched evaluation for any number of throat states)
+    properties = surrogate(s0, h_star)
+    rho_star = properties['rho']
+    a_star = properties['SpeedOfSound']
 
     # Computing F_star
     F_rho_star_a_star = rho_star * a_star
 
     return a_star, rho_star, F_rho_star_a_star
-
@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import instrument
+import write_to_csv
+from thermo import (load_thermodynamic_data, construct_thermo_surrogate, construct_isentrope_surrogate,
+                    export_surrogate, import_surrogate, configure_evaluation, evaluation_settings)
+from nozzle_area import load_area_data, find_closest_index, AreaIndex
+from reservoir import create_reservoir_interpolator, get_reservoir_h_and_s
+from sonic import compute_hstar_sstar, compute_rho_star_astar_Fstar
+from indirect_method import process_nozzle_indirect_method
+from solution import NozzleSolution
+
+# Columns of the collected sweep output, in order
+COLUMNS = ('case', 'p0', 'T0', 'x', 'h', 'u', 'rho', 'p', 'T', 'M')
+HEADERS = ["Case", "Reservoir pressure (Pa)", "Reservoir temperature (K)", "x positions (m)",
+           "Enthalpy values (J/kg)", "Velocity values (m/s)", "Density values (kg/m^3)", "Pressure (Pa)",
+           "Temperature (K)", "Mach number values"]
+
+_ALIGNMENT = 64  # Byte alignment of each array inside the shared memory block
+
+
+class SharedSurrogate:
+    """
+    Copies the arrays of a fitted surrogate into one shared memory block.
+
+    Worker processes rebuild the surrogate from 'spec' with attach_surrogate, which maps the
+    block and wraps it in NumPy arrays without copying or refitting anything.
+    """
+
+    def __init__(self, surrogate):
+        arrays, meta = export_surrogate(surrogate)
+        layout = []
+        offset = 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            layout.append((name, offset, array.shape, array.dtype.str))
+            offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (name, start, shape, dtype) in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)
+            view[...] = arrays[name]
+        self.spec = (self.shm.name, layout, meta)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_surrogate(spec):
+    """
+    Rebuilds a surrogate from a SharedSurrogate spec. Returns the surrogate and the attached block,
+    which must stay referenced for as long as the surrogate is used.
+    """
+    name, layout, meta = spec
+    # Workers share the creating process's resource tracker, so the block is unlinked exactly once
+    shm = shared_memory.SharedMemory(name=name)
+
+    arrays = {}
+    for (array_name, start, shape, dtype) in layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+        array.flags.writeable = False
+        arrays[array_name] = array
+    return import_surrogate(arrays, meta), shm
+
+
+# Per-process state of the sweep workers
+_worker = {}
+
+
+def _init_worker(spec, x, A_x, instrumented=False, isentrope=True, memory=None):
+    if instrumented:
+        instrument.enable()
+        instrument.reset()  # Forked workers start with a copy of the parent's records
+    configure_evaluation(threads=1, memory=memory)  # The pool already has a process per core
+    surrogate, shm = attach_surrogate(spec)
+    _set_worker_state(surrogate, x, A_x, shm=shm, isentrope=isentrope)
+
+
+def _set_worker_state(surrogate, x, A_x, shm=None, isentrope=True):
+    A_star = np.min(A_x)
+    index_star = find_closest_index(A_x, A_star)
+    _worker.update(surrogate=surrogate, shm=shm, x=x, A_x=A_x, A_star=A_star, index_star=index_star,
+                   area_index=AreaIndex(x, A_x, index_star), isentrope=isentrope)
+
+
+def _solve_case(case):
+    # Indirect-method stage for one reservoir condition
+    surrogate = _worker['surrogate']
+    h0, s0, F_rho_a_star = case
+    Area = {'x': _worker['x']}
+    if _worker['isentrope']:
+        # Every query of the case is at s0. The sonic state comes from the same splines: near the throat
+        # the stations are sensitive to any mismatch in F* between the two surrogates
+        surrogate = construct_isentrope_surrogate(surrogate, s0, h0)
+        with instrument.stage('sonic'):
+            h_star, s_star = compute_hstar_sstar(s0, h0, surrogate)
+            F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, surrogate)[2]
+    with instrument.stage('nozzle'):
+        return process_nozzle_indirect_method(s0, h0, Area, _worker['A_x'], _worker['A_star'], F_rho_a_star,
+                                              _worker['index_star'], surrogate, _worker['area_index'])
+
+
+def _solve_case_collect(case):
+    # Pool version of _solve_case: also ships the worker's instrumentation records back to the parent
+    return _solve_case(case), instrument.collect()
+
+
+def run_sweep(p0, T0, df, surrogate, Area, workers=None, isentrope=True, memory=None):
+    """
+    Runs the reservoir -> sonic -> indirect-method pipeline for many reservoir conditions.
+
+    Reservoir states are solved for all conditions at once in this process; the nozzle stage is
+    fanned out over a process pool whose workers share the fitted surrogate through shared memory.
+    The sonic conditions are batched in this process too, or, with isentrope, solved by each case
+    on its own isentrope splines (as nozzle.solve_nozzle does).
+
+    Args:
+    - p0: Array of reservoir pressures (Pa).
+    - T0: Array of reservoir temperatures (K), same length as p0.
+    - df: DataFrame returned by load_thermodynamic_data.
+    - surrogate: Fitted thermodynamic surrogate.
+    - Area: DataFrame with area and position information.
+    - workers: Number of worker processes (None uses every core, 1 runs in this process).
+    - isentrope: Solve each case on 1D splines along its isentrope (thermo.IsentropeSurrogate).
+    - memory: Cap (bytes) on the surrogate kernel blocks evaluated at once, in this process and in every
+      worker (see thermo.configure_evaluation); None keeps the current cap.
+
+    Returns:
+    - Dictionary of equal-length columns (see COLUMNS), one row per (case, station sample); a case that
+      could not be solved has a single row of NaN properties.
+    """
+    p0 = np.atleast_1d(np.asarray(p0, dtype=np.float64))
+    T0 = np.atleast_1d(np.asarray(T0, dtype=np.float64))
+    configure_evaluation(memory=memory)
+    memory = evaluation_settings()['memory']  # Passed on to the workers
+
+    # Reservoir stage, vectorized over all conditions
+    with instrument.stage('reservoir'):
+        reservoir_interpolator = create_reservoir_interpolator(df)
+        h0, s0 = get_reservoir_h_and_s(p0, T0, reservoir_interpolator)
+
+    # Sonic stage, batched over all conditions (solved per case in the nozzle stage with isentropes)
+    if isentrope:
+        F_rho_a_star = np.full(len(h0), np.nan)
+    else:
+        with instrument.stage('sonic'):
+            h_star, s_star = compute_hstar_sstar(s0, h0, surrogate)
+            sound_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, surrogate)
+    cases = list(zip(*(np.asarray(value, dtype=float).tolist() for value in (h0, s0, F_rho_a_star))))
+
+    x = np.ascontiguousarray(Area['x'], dtype=np.float64)
+    A_x = np.ascontiguousarray(Area['A'], dtype=np.float64)
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _set_worker_state(surrogate, x, A_x, isentrope=isentrope)
+        try:
+            results = [_solve_case(case) for case in cases]
+        finally:
+            _worker.clear()
+    else:
+        with SharedSurrogate(surrogate) as shared, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                    initargs=(shared.spec, x, A_x, instrument.enabled(), isentrope, memory)) as pool:
+            chunksize = max(1, len(cases) // (4 * workers))
+            if instrument.enabled():
+                results = []
+                for result, records in pool.map(_solve_case_collect, cases, chunksize=chunksize):
+                    results.append(result)
+                    instrument.merge(records)
+            else:
+                results = list(pool.map(_solve_case, cases, chunksize=chunksize))
+
+    # Collect the per-case solutions into one block; the property columns are views of it. A case without
+    # samples (a reservoir or sonic state outside the table) keeps one NaN row, so every case index appears
+    results = [result if result.stations else NozzleSolution(np.full((7, 1), np.nan)) for result in results]
+    lengths = [result.stations for result in results]
+    columns = {'case': np.repeat(np.arange(len(cases)), lengths),
+               'p0': np.repeat(p0, lengths),
+               'T0': np.repeat(T0, lengths)}
+    columns.update(NozzleSolution.concatenate(results).as_dict())
+    return {name: columns[name] for name in COLUMNS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run the equilibrium nozzle solution over a grid of reservoir conditions.')
+    parser.add_argument('--p0', type=float, nargs='+', help='Reservoir pressures (Pa); combined with every T0')
+    parser.add_argument('--T0', type=float, nargs='+', help='Reservoir temperatures (K); combined with every p0')
+    parser.add_argument('--conditions', help='File with one "p0 T0" pair per line (instead of --p0/--T0)')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--thermo', default='data/output.dat', help='Thermodynamic table')
+    parser.add_argument('--area', default='data/area.dat', help='Nozzle area profile')
+    parser.add_argument('--output', default='data/sweep.dat', help='Output file')
+    parser.add_argument('--format', choices=['text', 'binary'], default='text',
+                        help='Tab separated text, or a directory of binary columns (see write_to_csv.write_binary)')
+    parser.add_argument('--report', action='store_true', help='Write the run report (JSON) next to the output')
+    parser.add_argument('--plots', help='Render the property panels of every case into DIR/case_<n>')
+    parser.add_argument('--no-isentrope', action='store_true',
+                        help='Query the 2D surrogate instead of splines along each isentrope')
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help='Cap on the surrogate kernel blocks evaluated at once, in this process and in every '
+                             'worker (see thermo.configure_evaluation)')
+    args = parser.parse_args(argv)
+
+    if args.conditions:
+        p0, T0 = np.loadtxt(args.conditions, ndmin=2).T
+    elif args.p0 and args.T0:
+        p0, T0 = np.array(list(itertools.product(args.p0, args.T0))).T
+    else:
+        parser.error('give either --conditions or both --p0 and --T0')
+
+    if args.report:
+        instrument.enable()
+        instrument.reset()
+    with instrument.stage('tables'):
+        df = load_thermodynamic_data(os.path.abspath(args.thermo))[0]
+        Area = load_area_data(os.path.abspath(args.area))
+    with instrument.stage('surrogate'):
+        surrogate = construct_thermo_surrogate(df)
+    columns = run_sweep(p0, T0, df, surrogate, Area, workers=args.workers, isentrope=not args.no_isentrope,
+                        memory=None if args.memory_limit is None else args.memory_limit * 2**20)
+
+    if args.format == 'binary':
+        write_to_csv.write_binary(args.output, list(columns.values()), HEADERS)
+    else:
+        write_to_csv.write_columns(args.output, list(columns.values()), HEADERS)
+    if args.plots:
+        import plots
+        bounds = np.flatnonzero(np.diff(columns['case'])) + 1
+        solutions = NozzleSolution([columns[name] for name in ('h', 'u', 'rho', 'p', 'T', 'M', 'x')]).split(bounds)
+        with instrument.stage('plots'):
+            plots.render_cases(solutions, [os.path.join(args.plots, f'case_{i}') for i in range(len(p0))],
+                               area=(Area['x'].values, Area['A'].values), workers=args.workers)
+    if args.report:
+        instrument.write_report(os.path.splitext(args.output.rstrip('/'))[0] + '_report.json',
+                                {'parameters': {'conditions': len(p0), 'workers': args.workers, 'thermo': args.thermo,
+                                                'area': args.area, 'output': args.output}})
+    failed = np.unique(columns['case'][np.isnan(columns['h'])])
+    if failed.size:
+        print(f'{failed.size} reservoir conditions outside the table (NaN rows): '
+              + ', '.join(f'case {i} (p0 = {p0[i]:.6g} Pa, T0 = {T0[i]:.6g} K)' for i in failed))
+    print(f'Completed {len(p0)} reservoir conditions ({len(columns["x"])} rows) -> {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -59,26 +59,52 @@ def interpolator_tester():
 def thermo_tester():
     file_path = path_tester()
     df, Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature = thermo.load_thermodynamic_data(file_path)
-    rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature = thermo.construct_rbf_interpolators(Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature)
-    h = np.log(0.3019409035292074e7)
-    s = np.log(0.9337903799336349e4)
-    rho = np.exp(rbf_interpolator_rho([[s, h]])[0])
+    surrogate = thermo.construct_thermo_surrogate(df)
+    h = 0.3019409035292074e7
+    s = 0.9337903799336349e4
+    rho = surrogate(s, h)['rho']
     print('Density', rho)
     print('Expected Density', 0.1383229745292957)
     print('Fractional Error', np.abs(rho - 0.1383229745292957) / 0.1383229745292957)
-    return df, rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature
+    return df, surrogate
 
 
 def sonic_tester():
     p0 = 5000000
     T0 = 4500
-    df, rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature = thermo_tester()
-    enthalpy_interpolator, entropy_interpolator = reservoir.create_reservoir_interpolator(df)
-    h0, s0 = reservoir.get_reservoir_h_and_s(p0, T0, enthalpy_interpolator, entropy_interpolator)
-    rho_ratio = sonic.__iterate_rho(h0, s0, rbf_interpolator_rho, rbf_interpolator_speed)
+    df, surrogate = thermo_tester()
+    reservoir_interpolator = reservoir.create_reservoir_interpolator(df)
+    h0, s0 = reservoir.get_reservoir_h_and_s(p0, T0, reservoir_interpolator)
+    rho_ratio = sonic.__iterate_rho(h0, s0, surrogate)
     print('Final Result', rho_ratio)
 
 
+def out_of_table_tester():
+    # A reservoir condition outside the table gives NaN results instead of failing (isentrope path included)
+    import nozzle
+    for isentrope in (True, False):
+        for center_tol in (None, 1e-3):
+            results = nozzle.solve_nozzle(7e6, 4800, direct=True, frozen=False, isentrope=isentrope,
+                                          center_tol=center_tol)
+            assert np.isnan(results['h0']) and results['isentrope_error'] is None
+            assert np.isnan(results['direct'].M).all()
+    print('Out-of-table reservoir condition: NaN results')
+
+
+def frozen_batch_tester():
+    # A 2-D batch of frozen-flow conditions: every case of the batch equals the single-condition solution
+    import nozzle
+    p0, T0 = np.array([[2e6], [5e6]]), np.array([[3000, 4000, 4500]])
+    batch = nozzle.solve_frozen(p0, T0)
+    assert batch.data.shape[1:3] == (2, 3)
+    for i in range(2):
+        for j in range(3):
+            case = batch.case((i, j))
+            assert np.allclose(case.data, nozzle.solve_frozen(p0[i, 0], T0[0, j]).data)
+            assert np.shares_memory(case.data, batch.data)
+    print('Frozen 2-D batch: cases match')
+
+
 def zip_tester():
     a = [1, 2, 3, 4, 5]
     b = [21, 22, 23, 24, 25]
@@ -92,12 +118,13 @@ def main_tester():
 
     # GIVEN
     from nozzle_area import load_area_data, find_closest_index, find_astar
-    from thermo import load_thermodynamic_data, construct_rbf_interpolators
+    from thermo import load_thermodynamic_data, construct_thermo_surrogate
 
     # IMPLEMENT
     from reservoir import get_reservoir_h_and_s, create_reservoir_interpolator
     from sonic import compute_hstar_sstar, compute_rho_star_astar_Fstar
     from indirect_method import process_nozzle_indirect_method
+    from direct_method import process_nozzle_direct_method
     from frozen import process_nozzle_perfect_gas
 
     # Load thermodynamic data from a file (contains enthalpy, entropy, density, etc.)
@@ -110,36 +137,33 @@ def main_tester():
     file_path = os.path.abspath(area_data)
     Area = load_area_data(file_path)
 
-    # Create Radial Basis Function (RBF) interpolators for various thermodynamic properties
-    # These interpolators are used to estimate values like density and speed of sound at different states
-    rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature = construct_rbf_interpolators(
-        Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature)
+    # Create a Radial Basis Function (RBF) surrogate for the thermodynamic properties
+    # One fit returns density, speed of sound, pressure and temperature at different states
+    surrogate = construct_thermo_surrogate(df)
 
     # Compute reservoir conditions based on the provided pressure and temperature
     # These conditions define the thermodynamic state at the reservoir (upstream of the nozzle)
-    enthalpy_interpolator, entropy_interpolator = create_reservoir_interpolator(df)
+    reservoir_interpolator = create_reservoir_interpolator(df)
 
     # Example reservoir conditions: given pressure p and temperature T, get h and s
     p0 = 5000000
     T0 = 4500
-    h0, s0 = get_reservoir_h_and_s(p0, T0, enthalpy_interpolator, entropy_interpolator)
+    h0, s0 = get_reservoir_h_and_s(p0, T0, reservoir_interpolator)
 
     # Find the nozzle throat location (x*) and the corresponding minimum area (A*)
     x_star, A_star = find_astar(Area)
     index_star = find_closest_index(Area['A'], A_star)
 
-    # Compute h* and s* at the throat using the speed of sound interpolator
-    h_star, s_star = compute_hstar_sstar(s0, h0, rbf_interpolator_speed)
+    # Compute h* and s* at the throat using the speed of sound from the surrogate
+    h_star, s_star = compute_hstar_sstar(s0, h0, surrogate)
 
     # Compute a*, rho* and F(h0, s0)
-    sound_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, rbf_interpolator_rho,
-                                                                      rbf_interpolator_speed)
+    sound_star, rho_star, F_rho_a_star = compute_rho_star_astar_Fstar(s_star, h_star, surrogate)
 
     # Example 1D domain with known area variation A_x
     A_x = Area['A']
     result = process_nozzle_indirect_method(
-        s0, h0, Area, A_x, A_star, F_rho_a_star, index_star,
-        rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature
+        s0, h0, Area, A_x, A_star, F_rho_a_star, index_star, surrogate
     )
     enthalpy_values, velocity_values, density_values, pressure_values, temperature_values, mach_values, x_positions = result
 
@@ -150,39 +174,13 @@ def main_tester():
     mach_values = np.array(mach_values)
     x_positions = np.array(x_positions)
 
-    def bisection_search(index):
-        # Finding the inlet velocity
-        # Defining parameters for the bisection method
-        high = h0  # Right boundary of the search interval
-        low = 0  # Left boundary of the search interval
-        max_iterations = int(1e7)  # Maximum iterations for bisection search
-        precision = 1e-6  # Tolerance for the difference between expected and approximated values
-
-        # Bisection method search
-        for i in range(max_iterations):
-            # Parameters
-            mid = (low + high) / 2  # Middle of the interval
-            h = mid  # Guess for h is the middle of the interval
-            log_key = np.log([s0, h]).reshape(1, -1)  # Setting the log input for interpolators
-            u = np.sqrt(2 * (h0 - h))  # Inlet velocity (guess)
-            rho = np.exp(rbf_interpolator_rho(log_key)[0])  # Inlet density (guess)
-            A_guess = (F_rho_a_star / (rho * u)) * A_star  # Inlet area (guess)
-            error = A_guess - A_x[index]  # Finding the difference between actual inlet area and guessed inlet area
-
-            # Adjusting the search via the bisection method
-            if error > precision:
-                low = mid
-            elif error < -precision:
-                high = mid
-            else:
-                break
-        h_inlet = (low + high) / 2
-        print(Area['x'][index], h_inlet)
-
-    bisection_search(0)
-    bisection_search(1)
-    bisection_search(2)
-    bisection_search(3)
+    # Direct method: enthalpy at every area station (replaces the scalar bisection prototype)
+    result = process_nozzle_direct_method(s0, h0, Area, A_x, A_star, F_rho_a_star, index_star, h_star, surrogate,
+                                          full_output=True)
+    (h_direct, x_direct), info = result[0].columns(('h', 'x')), result[1]
+    for index in range(4):
+        print(x_direct[index], h_direct[index])
+    print('Iterations', info['iterations'], 'Max area error', info['max_area_error'])
 
 
 if __name__ == '__main__':
@@ -8,19 +8,70 @@ This file has been significantly modified and fully implemented by awang104-2 si
 The full license text is available in the LICENSE file in the project root.
 """
 
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-from scipy.interpolate import RBFInterpolator
+import scipy
+from scipy.interpolate import PchipInterpolator, RBFInterpolator, RectBivariateSpline
+from scipy.spatial import Delaunay, KDTree
+
+import instrument
+from binary_table import load_table, TABLE_CACHE_DIR
+
+# Directory where fitted interpolators are stored between runs
+CACHE_DIR = 'data/cache'
+CACHE_VERSION = 1  # Bump when the on-disk layout changes
+
+# Columns of the thermodynamic table (output.dat)
+THERMO_COLUMNS = ('T', 'p', 'rho', 'MolarMass', 'Enthalpy', 'Entropy', 'SpeedOfSound')
+
+# Properties modelled by the thermodynamic surrogate by default (column names of output.dat)
+THERMO_PROPERTIES = ('rho', 'SpeedOfSound', 'p', 'T')
 
+# Arrays that make up a fitted (global) RBFInterpolator
+RBF_ARRAYS = ('y', 'd', 'smoothing', 'powers', 'shift', 'scale', 'coeffs')
 
-def load_thermodynamic_data(filename):
+# Each RBF kernel phi(r) and phi'(r) / r (the gradient of phi(|x - y|) is the latter times x - y), as
+# functions of r and r^2 written with products only (much faster than float powers)
+RBF_KERNEL_GRADIENTS = {
+    'linear': (lambda r, r2: -r, lambda r, r2: -1 / r),
+    'thin_plate_spline': (lambda r, r2: r2 * np.log(r), lambda r, r2: 2 * np.log(r) + 1),
+    'cubic': (lambda r, r2: r2 * r, lambda r, r2: 3 * r),
+    'quintic': (lambda r, r2: -r2 * r2 * r, lambda r, r2: -5 * r2 * r),
+    'multiquadric': (lambda r, r2: -np.sqrt(r2 + 1), lambda r, r2: -1 / np.sqrt(r2 + 1)),
+    'inverse_multiquadric': (lambda r, r2: 1 / np.sqrt(r2 + 1), lambda r, r2: -1 / ((r2 + 1) * np.sqrt(r2 + 1))),
+    'inverse_quadratic': (lambda r, r2: 1 / (r2 + 1), lambda r, r2: -2 / ((r2 + 1) * (r2 + 1))),
+    'gaussian': (lambda r, r2: np.exp(-r2), lambda r, r2: -2 * np.exp(-r2)),
+}
+SINGULAR_KERNELS = ('linear', 'thin_plate_spline')  # Kernels whose expressions above are not finite at r = 0
+GRADIENT_CHUNK = 1 << 16  # Kernel entries (query points x centers) per block of the gradient, sized to stay in cache
+EVALUATION_CHUNK = 1000000  # Kernel entries per block of a value evaluation (RBFInterpolator's own block size)
+EVALUATION_MEMORY = 1 << 28  # Default cap (bytes) on the kernel blocks held at once by all evaluation threads
+_evaluation = {'threads': os.cpu_count() or 1, 'memory': EVALUATION_MEMORY}  # See configure_evaluation
+ISENTROPE_SPAN = (0.25, 1.0)  # Default enthalpy range of an isentrope surrogate, as fractions of h0
+
+# RBF settings chosen by tune_surrogate.py, and the settings used when no configuration was saved
+SURROGATE_CONFIG = 'data/surrogate_config.json'
+DEFAULT_RBF_SETTINGS = {'kernel': 'quintic'}
+RBF_SETTINGS = ('kernel', 'epsilon', 'smoothing', 'degree', 'neighbors')
+
+
+def load_thermodynamic_data(filename, cache_dir=TABLE_CACHE_DIR):
     """
     Load thermodynamic data from the specified file.
+
+    The text table is parsed once and stored as memory-mapped binary columns in 'cache_dir'
+    (see binary_table); later loads read those directly. Pass cache_dir=None to always parse.
     """
     # Load the data from the file
-    df = pd.read_csv(filename, sep=r'\s+', comment='#', header=None,
-                     names=['T', 'p', 'rho', 'MolarMass', 'Enthalpy', 'Entropy', 'SpeedOfSound'])  # Column names
-    
+    df = load_table(filename, _read_thermodynamic_text, THERMO_COLUMNS, cache_dir)
+
     # Access variables from the dataset
     Enthalpy = df['Enthalpy'].values
     Entropy = df['Entropy'].values
@@ -32,29 +83,737 @@ def load_thermodynamic_data(filename):
     return df, Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature
 
 
-def construct_rbf_interpolators(Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature):
+def _read_thermodynamic_text(filename):
+    return pd.read_csv(filename, sep=r'\s+', comment='#', header=None, names=list(THERMO_COLUMNS))  # Column names
+
+
+class ThermoSurrogate:
     """
-    Constructs RBF interpolators for density and speed of sound based on Enthalpy and Entropy.
+    Multi-output RBF surrogate of thermodynamic properties as functions of entropy and enthalpy.
+
+    One RBFInterpolator is fitted on (log s, log h) with one column of log values per property,
+    so the kernel matrix is factorized once and every query evaluates all properties together.
+    """
+
+    def __init__(self, interpolator, properties, max_error=None):
+        self.interpolator = interpolator
+        self.properties = tuple(properties)
+        self.max_error = max_error  # Worst fractional error per property over the rows and probes (reduced centers)
+
+    def log_evaluate(self, log_inputs):
+        """
+        Evaluates the surrogate in log space.
+
+        Args:
+        - log_inputs: (n, 2) array of [log s, log h] pairs.
+
+        Returns:
+        - (n, k) array of log property values, one column per entry of self.properties.
+        """
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        instrument.count('surrogate', len(log_inputs))
+        interpolator = self.interpolator
+        values = np.empty((len(log_inputs), interpolator.d.shape[1]))
+
+        def block(start, stop):
+            values[start:stop] = interpolator(log_inputs[start:stop]).reshape(stop - start, -1)
+
+        # Each query row builds one row of kernel entries (one per center or neighbor, plus the polynomial tail).
+        # The rows per call match the blocks RBFInterpolator uses itself, so the chunking does not change the results
+        row_entries = (interpolator.neighbors or len(interpolator.y)) + len(interpolator.powers)
+        map_chunks(block, len(log_inputs), EVALUATION_CHUNK // row_entries + 1, 8 * row_entries)
+        return values
+
+    def log_evaluate_gradient(self, log_inputs):
+        """
+        Evaluates the surrogate and its gradient in log space in one pass.
+
+        The gradient of the RBF is analytic: the kernel term contributes phi'(r) / r * eps^2 * (x - y_j)
+        per center and the polynomial tail is differentiated term by term. Local (neighbors)
+        interpolators have no global coefficients and fall back to central differences.
+
+        Args:
+        - log_inputs: (n, 2) array of [log s, log h] pairs.
+
+        Returns:
+        - (n, k) array of log property values.
+        - (n, 2, k) array of their derivatives with respect to log s and log h.
+        """
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        instrument.count('surrogate_gradient', len(log_inputs))
+        interpolator = self.interpolator
+        if interpolator.neighbors is not None:
+            return _central_gradient(self.log_evaluate, log_inputs)
+
+        epsilon, coeffs, centers = interpolator.epsilon, interpolator._coeffs, len(interpolator.y)
+        powers, shift, scale = interpolator.powers, interpolator._shift, interpolator._scale
+        kernel, kernel_gradient = RBF_KERNEL_GRADIENTS[interpolator.kernel]
+        # Kernel distances are taken between scaled points (as RBFInterpolator does)
+        y = [np.ascontiguousarray(interpolator.y[:, axis]) * epsilon for axis in range(2)]
+        weights = coeffs[:centers]
+        y_weights = [column[:, np.newaxis] * weights for column in y]
+        tail = coeffs[centers:]
+
+        values = np.empty((len(log_inputs), coeffs.shape[1]))
+        gradient = np.empty((len(log_inputs), 2, coeffs.shape[1]))
+
+        def block(start, stop):
+            x = log_inputs[start:stop]
+            x_scaled = x * epsilon
+            difference = x_scaled[:, 0, np.newaxis] - y[0]
+            r2 = difference * difference
+            difference = np.subtract(x_scaled[:, 1, np.newaxis], y[1], out=difference)
+            r2 += difference * difference
+            r = np.sqrt(r2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                phi, weight = kernel(r, r2), kernel_gradient(r, r2)
+            if interpolator.kernel in SINGULAR_KERNELS:
+                at_center = r == 0  # Query points on a center: phi(0) = 0 and the kinked/flat kernel adds no slope
+                phi[at_center] = 0
+                weight[at_center] = 0
+
+            # Polynomial tail: monomials of (x - shift) / scale and their derivatives
+            x_hat = (x - shift) / scale
+            monomials = np.prod(x_hat[:, np.newaxis, :]**powers, axis=-1)
+            values[start:stop] = phi @ weights + monomials @ tail
+            weighted = weight @ weights
+            for axis in range(2):
+                lowered = powers.copy()
+                lowered[:, axis] = np.maximum(lowered[:, axis] - 1, 0)
+                d_monomials = powers[:, axis] * np.prod(x_hat[:, np.newaxis, :]**lowered, axis=-1) / scale[axis]
+                # eps * sum_j w_ij (x_i - y_j) c_j, as two matrix products
+                gradient[start:stop, axis] = epsilon * (x_scaled[:, axis, np.newaxis] * weighted
+                                                        - weight @ y_weights[axis]) + d_monomials @ tail
+
+        # A block holds about four kernel-sized arrays at once (difference or phi, r2, r and weight)
+        map_chunks(block, len(log_inputs), max(1, GRADIENT_CHUNK // centers), 4 * 8 * centers)
+        return values, gradient
+
+    def __call__(self, s, h, gradient=False):
+        """
+        Evaluates every property at the states (s, h).
+
+        Args:
+        - s: Entropy (J/kg·K), scalar or array.
+        - h: Enthalpy (J/kg), scalar or array broadcastable against s.
+        - gradient: If True, also return the partial derivatives of every property, d<name>_ds and
+          d<name>_dh (e.g. 'drho_dh', 'dSpeedOfSound_dh'), computed in the same batched call.
+
+        Returns:
+        - Dictionary mapping property name to an array with the broadcast shape of s and h.
+        """
+        s, h = np.broadcast_arrays(np.asarray(s, dtype=np.float64), np.asarray(h, dtype=np.float64))
+        log_inputs = np.column_stack((np.log(s).ravel(), np.log(h).ravel()))
+        if not gradient:
+            values = np.exp(self.log_evaluate(log_inputs))
+            return {name: values[:, i].reshape(s.shape) for i, name in enumerate(self.properties)}
+
+        # Chain rule from log space: dq/dh = q * dlog(q)/dlog(h) / h, and likewise for s
+        log_values, log_gradient = self.log_evaluate_gradient(log_inputs)
+        values = np.exp(log_values)
+        result = {}
+        for i, name in enumerate(self.properties):
+            result[name] = values[:, i].reshape(s.shape)
+            result[f'd{name}_ds'] = (values[:, i] * log_gradient[:, 0, i]).reshape(s.shape) / s
+            result[f'd{name}_dh'] = (values[:, i] * log_gradient[:, 1, i]).reshape(s.shape) / h
+        return result
+
+    def column(self, name):
+        """
+        Returns a callable with the interface of a single-property RBFInterpolator (log inputs, log output).
+        """
+        index = self.properties.index(name)
+        return lambda log_inputs: self.log_evaluate(log_inputs)[:, index]
+
+
+class TabulatedThermo(ThermoSurrogate):
+    """
+    Tabulated equation of state: a surrogate sampled once on a regular (log s, log h) grid.
+
+    Queries are answered by bicubic spline lookup, which costs O(1) per point instead of the
+    O(N) kernel sum of the RBF. max_deviation holds, per property, the largest relative
+    difference from the surrogate that was tabulated (measured inside the table's data hull);
+    max_error reports the same measurement, like the other surrogate types.
+    """
+
+    def __init__(self, log_s, log_h, values, properties, max_deviation=None):
+        super().__init__(None, properties, max_deviation)
+        self.log_s = np.asarray(log_s)
+        self.log_h = np.asarray(log_h)
+        self.values = values
+        self.max_deviation = max_deviation
+        self.splines = [RectBivariateSpline(self.log_s, self.log_h, values[:, :, i], kx=3, ky=3)
+                        for i in range(len(self.properties))]
+
+    def log_evaluate(self, log_inputs):
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        instrument.count('tabulated_surrogate', len(log_inputs))
+        return np.column_stack([spline.ev(log_inputs[:, 0], log_inputs[:, 1]) for spline in self.splines])
+
+    def log_evaluate_gradient(self, log_inputs):
+        # Spline values and their derivatives along both grid axes
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        instrument.count('tabulated_surrogate_gradient', len(log_inputs))
+        a, b = log_inputs[:, 0], log_inputs[:, 1]
+        values = np.column_stack([spline.ev(a, b) for spline in self.splines])
+        gradient = np.stack([np.column_stack([spline.ev(a, b, dx=1) for spline in self.splines]),
+                             np.column_stack([spline.ev(a, b, dy=1) for spline in self.splines])], axis=1)
+        return values, gradient
+
+
+class IsentropeSurrogate(ThermoSurrogate):
+    """
+    One-dimensional equation of state along a single isentrope s = s0.
+
+    Downstream of the reservoir every query is at the reservoir entropy, so the properties are
+    monotone PCHIP splines of log h (log values, and their log s derivatives for gradient=True)
+    sampled from a 2D surrogate. A query costs O(log N) instead of a kernel sum over all centers.
+    Points off the isentrope or outside [h_low, h_high] are passed to the 2D surrogate, so it can
+    replace that surrogate anywhere. max_error is the largest relative difference from the 2D
+    surrogate measured between the spline nodes.
+    """
+
+    def __init__(self, surrogate, s0, log_h, log_values, log_ds, max_error=None):
+        self.surrogate = surrogate
+        self.s0 = float(s0)
+        self.log_s0 = np.log(self.s0)
+        self.log_h = np.asarray(log_h)
+        self.h_low, self.h_high = np.exp(self.log_h[0]), np.exp(self.log_h[-1])
+        self.properties = surrogate.properties
+        self.max_error = max_error
+        self.spline = PchipInterpolator(self.log_h, log_values, axis=0)
+        self.slope = self.spline.derivative()
+        self.ds_spline = PchipInterpolator(self.log_h, log_ds, axis=0)
+
+    def _on_isentrope(self, log_inputs):
+        return (log_inputs[:, 0] == self.log_s0) & (log_inputs[:, 1] >= self.log_h[0]) \
+            & (log_inputs[:, 1] <= self.log_h[-1])
+
+    def log_evaluate(self, log_inputs):
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        on = self._on_isentrope(log_inputs)
+        instrument.count('isentrope_surrogate', int(on.sum()))
+        if on.all():
+            return self.spline(log_inputs[:, 1])
+        values = np.empty((len(log_inputs), len(self.properties)))
+        values[on] = self.spline(log_inputs[on, 1])
+        values[~on] = self.surrogate.log_evaluate(log_inputs[~on])
+        return values
+
+    def log_evaluate_gradient(self, log_inputs):
+        log_inputs = np.asarray(log_inputs, dtype=np.float64).reshape(-1, 2)
+        on = self._on_isentrope(log_inputs)
+        instrument.count('isentrope_surrogate_gradient', int(on.sum()))
+        values = np.empty((len(log_inputs), len(self.properties)))
+        gradient = np.empty((len(log_inputs), 2, len(self.properties)))
+        log_h = log_inputs[on, 1]
+        values[on] = self.spline(log_h)
+        gradient[on, 0] = self.ds_spline(log_h)
+        gradient[on, 1] = self.slope(log_h)
+        if not on.all():
+            values[~on], gradient[~on] = self.surrogate.log_evaluate_gradient(log_inputs[~on])
+        return values, gradient
+
+
+def construct_isentrope_surrogate(surrogate, s0, h0, span=ISENTROPE_SPAN, tol=1e-5, samples=65, max_samples=1025):
+    """
+    Samples a 2D surrogate along the isentrope s = s0 into an IsentropeSurrogate.
+
+    The nodes are evenly spaced in log h. After each batched evaluation the spline is compared with
+    the surrogate at the midpoints between the nodes; while the largest relative difference exceeds
+    tol, the midpoints are added as nodes (doubling their number).
+
+    Args:
+    - surrogate: Fitted ThermoSurrogate (or TabulatedThermo) to sample and to fall back on.
+    - s0: Entropy of the isentrope (J/kg·K).
+    - h0: Reservoir enthalpy (J/kg); the splines cover span[0] * h0 to span[1] * h0.
+    - span: Enthalpy range as fractions of h0.
+    - tol: Largest allowed relative difference from the surrogate.
+    - samples: Initial number of nodes.
+    - max_samples: Upper limit on the number of nodes.
+
+    Returns:
+    - IsentropeSurrogate; its max_error is the last measured difference (above tol only if max_samples was reached).
+      A non-finite s0 or h0 (a reservoir condition outside the table) returns 'surrogate' itself, whose
+      queries at that state are NaN.
+    """
+    s0, h0 = float(s0), float(h0)
+    if not (np.isfinite(s0) and np.isfinite(h0)):
+        return surrogate
+    with instrument.stage('isentrope'):
+        log_h = np.linspace(np.log(span[0] * h0), np.log(span[1] * h0), samples)
+        log_values, log_gradient = surrogate.log_evaluate_gradient(np.column_stack((np.full(samples, np.log(s0)), log_h)))
+        while True:
+            isentrope = IsentropeSurrogate(surrogate, s0, log_h, log_values, log_gradient[:, 0])
+            middle = (log_h[1:] + log_h[:-1]) / 2
+            middle_values, middle_gradient = surrogate.log_evaluate_gradient(
+                np.column_stack((np.full(len(middle), np.log(s0)), middle)))
+            isentrope.max_error = float(np.abs(np.expm1(isentrope.spline(middle) - middle_values)).max())
+            if isentrope.max_error <= tol or 2 * len(log_h) - 1 > max_samples:
+                return isentrope
+
+            # Interleave the midpoints with the nodes
+            log_h = np.insert(log_h, np.arange(1, len(log_h)), middle)
+            log_values = np.insert(log_values, np.arange(1, len(log_values)), middle_values, axis=0)
+            log_gradient = np.insert(log_gradient, np.arange(1, len(log_gradient)), middle_gradient, axis=0)
+
+
+def _central_gradient(log_evaluate, log_inputs, step=1e-6):
+    # Central differences in log space, all shifted points in one batched evaluation
+    n = len(log_inputs)
+    shifts = np.array([[0, 0], [step, 0], [-step, 0], [0, step], [0, -step]])
+    values = log_evaluate((log_inputs[np.newaxis, :, :] + shifts[:, np.newaxis, :]).reshape(-1, 2)).reshape(5, n, -1)
+    gradient = np.stack([(values[1] - values[2]) / (2 * step), (values[3] - values[4]) / (2 * step)], axis=1)
+    return values[0], gradient
+
+
+def configure_evaluation(threads=None, memory=None):
+    """
+    Sets how large surrogate evaluations are spread over threads (see map_chunks). Settings left as
+    None keep their current value (by default every core and EVALUATION_MEMORY).
+
+    Args:
+    - threads: Number of evaluation threads (1 evaluates in the calling thread).
+    - memory: Upper bound (bytes) on the kernel blocks held at once by all threads together.
+    """
+    if memory is not None and memory < 1:
+        raise ValueError('the evaluation memory cap must be positive')
+    if threads is not None and threads < 1:
+        raise ValueError('the number of evaluation threads must be positive')
+    if threads is not None:
+        pool = _evaluation.pop('pool', None)
+        if pool is not None:
+            pool.shutdown(wait=False)
+        _evaluation['threads'] = int(threads)
+    if memory is not None:
+        _evaluation['memory'] = int(memory)
+
+
+def evaluation_settings():
+    """
+    Returns the current {'threads', 'memory'} of large surrogate evaluations (see configure_evaluation).
+    """
+    return {'threads': _evaluation['threads'], 'memory': _evaluation['memory']}
+
+
+def map_chunks(function, rows, step, row_bytes):
+    """
+    Calls function(start, stop) over consecutive row ranges of a batch, in parallel threads.
+
+    The kernel evaluations and matrix products run in NumPy/BLAS and SciPy code that releases
+    the GIL, so the threads (configure_evaluation) evaluate ranges on separate cores. No more
+    ranges run at once than fit in the memory cap; a cap below a single range shrinks the ranges
+    instead. Batches of a single range are evaluated in the calling thread.
+
+    Args:
+    - function: Function writing the results of rows [start, stop) in place.
+    - rows: Number of rows of the batch.
+    - step: Rows per range.
+    - row_bytes: Work memory of one row (its kernel blocks).
+    """
+    threads, memory = _evaluation['threads'], _evaluation['memory']
+    row_bytes = max(1, row_bytes)
+    step = max(1, min(step, memory // row_bytes))
+    ranges = [(start, min(start + step, rows)) for start in range(0, rows, step)]
+    workers = min(threads, len(ranges), max(1, memory // (step * row_bytes)))
+    if workers <= 1:
+        for start, stop in ranges:
+            function(start, stop)
+        return
+
+    # Interleaved groups of ranges, one task per allowed worker, keep the memory in flight under the cap
+    pool = _evaluation.get('pool')
+    if pool is None or _evaluation.get('pid') != os.getpid():  # A forked process does not inherit the threads
+        pool = _evaluation['pool'] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='thermo')
+        _evaluation['pid'] = os.getpid()
+    list(pool.map(lambda group: [function(start, stop) for start, stop in group],
+                  [ranges[i::workers] for i in range(workers)]))
+
+
+def tabulate_surrogate(surrogate, shape=(128, 128), cache_dir=CACHE_DIR):
+    """
+    Samples a fitted surrogate onto a regular (log s, log h) grid spanning its data points.
+
+    Args:
+    - surrogate: Fitted ThermoSurrogate.
+    - shape: Number of grid nodes in log s and log h.
+    - cache_dir: Directory holding cached tables, or None to always resample.
+
+    Returns:
+    - TabulatedThermo instance with the maximum deviation from 'surrogate' in max_deviation.
+    """
+    centers = np.asarray(surrogate.interpolator.y)
+    entry = None
+    if cache_dir is not None:
+        interpolator = surrogate.interpolator
+        digest = hashlib.sha256(np.ascontiguousarray(getattr(interpolator, '_coeffs', interpolator.d)).tobytes())
+        digest.update(centers.tobytes())
+        digest.update(f'{shape}-{surrogate.properties}-{interpolator.kernel}-{interpolator.neighbors}-'
+                      f'{CACHE_VERSION}'.encode())
+        entry = os.path.join(os.path.abspath(cache_dir), 'table_' + digest.hexdigest()[:32])
+        if os.path.isdir(entry):
+            try:
+                with open(os.path.join(entry, 'meta.json')) as file:
+                    meta = json.load(file)
+                arrays = [np.load(os.path.join(entry, name + '.npy'), mmap_mode='r')
+                          for name in ('log_s', 'log_h', 'values')]
+                return TabulatedThermo(*arrays, meta['properties'], meta['max_deviation'])
+            except (OSError, ValueError, KeyError):
+                shutil.rmtree(entry, ignore_errors=True)
+
+    # Sample the surrogate once on the grid
+    with instrument.stage('tabulate_surrogate'):
+        low, high = centers.min(axis=0), centers.max(axis=0)
+        log_s = np.linspace(low[0], high[0], shape[0])
+        log_h = np.linspace(low[1], high[1], shape[1])
+        grid = np.stack(np.meshgrid(log_s, log_h, indexing='ij'), axis=-1).reshape(-1, 2)
+        values = surrogate.log_evaluate(grid).reshape(shape[0], shape[1], -1)
+        table = TabulatedThermo(log_s, log_h, values, surrogate.properties)
+
+        # Compare against the surrogate at the cell centers that lie inside the data (extrapolated corners are ignored)
+        mid_s, mid_h = (log_s[1:] + log_s[:-1]) / 2, (log_h[1:] + log_h[:-1]) / 2
+        check = np.stack(np.meshgrid(mid_s, mid_h, indexing='ij'), axis=-1).reshape(-1, 2)
+        check = check[Delaunay(centers).find_simplex(check) >= 0]
+        deviation = np.abs(np.expm1(table.log_evaluate(check) - surrogate.log_evaluate(check))).max(axis=0)
+        table.max_deviation = table.max_error = dict(zip(table.properties, deviation.tolist()))
+
+    if entry is not None:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        try:
+            for name, array in (('log_s', log_s), ('log_h', log_h), ('values', values)):
+                np.save(os.path.join(staging, name + '.npy'), array)
+            with open(os.path.join(staging, 'meta.json'), 'w') as file:
+                json.dump({'properties': list(table.properties), 'max_deviation': table.max_deviation}, file)
+            os.replace(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+    return table
+
+
+def construct_thermo_surrogate(df, properties=THERMO_PROPERTIES, kernel=None, cache_dir=CACHE_DIR,
+                               tabulate=False, grid_shape=(128, 128), settings=None, center_selection=None):
+    """
+    Constructs a single multi-output surrogate for the given properties based on Enthalpy and Entropy.
+
+    Args:
+    - df: DataFrame returned by load_thermodynamic_data.
+    - properties: Columns of df to model (any of rho, SpeedOfSound, p, T, MolarMass).
+    - kernel: RBF kernel name, overriding the one in 'settings'.
+    - cache_dir: Directory holding cached fits, or None to always refit.
+    - tabulate: If True, return the RBF sampled onto a regular grid (TabulatedThermo) for O(1) lookups.
+    - grid_shape: Grid size used when tabulate is True.
+    - settings: RBFInterpolator settings (kernel, epsilon, smoothing, degree, neighbors); None uses the
+      configuration saved by tune_surrogate.py (see load_surrogate_settings).
+    - center_selection: None to use every table row as a center, or a dictionary of select_centers
+      options (tol, max_centers, focus, ...) to fit on a greedily selected subset. The worst error
+      of the reduced surrogate on the table rows and the off-row probes (see select_centers) is then
+      stored in its max_error attribute.
+
+    Returns:
+    - ThermoSurrogate (or TabulatedThermo) instance.
+    """
+    settings = dict(load_surrogate_settings() if settings is None else settings)
+    if kernel is not None:
+        settings['kernel'] = kernel
+    x = np.log(np.vstack((df['Entropy'].values, df['Enthalpy'].values))).T  # Input data: log of Entropy and Enthalpy
+    y = np.log(np.column_stack([df[name].values for name in properties]))  # Log of each property
+    if center_selection is None:
+        surrogate = ThermoSurrogate(fit_rbf_cached(x, y, cache_dir, **settings), properties)
+    else:
+        centers, max_error = select_centers(x, y, cache_dir=cache_dir, settings=settings, **center_selection)
+        surrogate = ThermoSurrogate(fit_rbf_cached(x[centers], y[centers], cache_dir, **settings), properties,
+                                    dict(zip(properties, max_error)))
+    if tabulate:
+        surrogate = tabulate_surrogate(surrogate, grid_shape, cache_dir)
+    return surrogate
+
+
+def select_centers(x, y, tol=1e-4, max_centers=2000, focus=None, focus_width=0.05, far_weight=0.1,
+                   initial=64, growth=0.25, settings=None, cache_dir=CACHE_DIR):
+    """
+    Greedy error-driven selection of RBF centers among the table rows.
+
+    Starting from a space-filling seed set, the RBF is fitted on the selected rows and evaluated on
+    every row and on off-row probe points; the rows with the largest (weighted) fractional error are
+    added, and the process repeats until the weighted error is below 'tol' everywhere or max_centers
+    is reached. Each round adds a fraction 'growth' of the current set, so only a few fits are needed.
+
+    The probes are samples of the focus isentrope over ISENTROPE_SPAN (the states the nozzle solvers
+    query) or, without a focus, the midpoints of the edges of the Delaunay triangulation of the rows.
+    They have no table values, so their error is measured against the RBF fitted on every row; a
+    probe with too large an error adds the nearest unselected of its 32 nearest rows. Checking the rows alone would stop
+    as soon as the centers interpolate the table, however far the surrogate strays between the rows.
+
+    With a focus (s0, h0) the error of each row and probe is weighted by its distance (in log s, log h)
+    to the part of the isentrope s = s0 the nozzle expands through, h0 / 2 <= h <= h0: points near it
+    must meet 'tol', points far from it only tol / far_weight.
+
+    Args:
+    - x: (N, 2) array of [log s, log h].
+    - y: (N, k) array of log property values.
+    - tol: Target weighted fractional error.
+    - max_centers: Upper limit on the number of centers.
+    - focus: Reservoir state (s0, h0) to concentrate the accuracy on, or None for uniform accuracy
+      (also used when the state is not finite, e.g. a reservoir condition outside the table).
+    - focus_width: Width (in log units) of the focus region.
+    - far_weight: Error weight far from the focus (1 near it).
+    - initial: Size of the seed set.
+    - growth: Fraction of the current set added per round.
+    - settings: RBFInterpolator settings.
+    - cache_dir: Directory holding cached selections, or None.
+
+    Returns:
+    - Sorted array of selected row indices.
+    - Array of the worst (unweighted) fractional error of each property over all rows and probes.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    settings = dict(DEFAULT_RBF_SETTINGS if settings is None else settings)
+    if focus is not None and not np.isfinite(np.asarray(focus, dtype=np.float64)).all():
+        focus = None
+    options = {'tol': tol, 'max_centers': max_centers, 'focus': None if focus is None else [float(v) for v in focus],
+               'focus_width': focus_width, 'far_weight': far_weight, 'initial': initial, 'growth': growth,
+               'probes': 'isentrope' if focus is not None else 'delaunay_midpoints'}
+
+    entry = None
+    if cache_dir is not None:
+        entry = os.path.join(os.path.abspath(cache_dir),
+                             'centers_' + _rbf_cache_key(x, y, dict(settings, selection=json.dumps(options))))
+        try:
+            with open(entry + '.json') as file:
+                cached = json.load(file)
+            return np.asarray(cached['centers']), np.asarray(cached['max_error'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with instrument.stage('select_centers'):
+        # Off-row probes, with reference values from the fit on every row, and the rows nearest to each
+        if focus is not None:
+            log_h = np.linspace(np.log(ISENTROPE_SPAN[0] * focus[1]), np.log(ISENTROPE_SPAN[1] * focus[1]), 257)
+            probes = np.column_stack((np.full(len(log_h), np.log(focus[0])), log_h))
+        else:
+            edges = np.vstack([Delaunay(x).simplices[:, pair] for pair in ((0, 1), (1, 2), (0, 2))])
+            edges = np.unique(np.sort(edges, axis=1), axis=0)
+            probes = (x[edges[:, 0]] + x[edges[:, 1]]) / 2
+        reference = fit_rbf_cached(x, y, cache_dir, **settings)(probes)
+        scale = np.maximum(np.ptp(x, axis=0), np.finfo(float).tiny)
+        nearest = KDTree(x / scale).query(probes / scale, k=min(32, len(x)))[1].reshape(len(probes), -1)
+
+        # Weight of every row and probe: 1 near the focus isentrope segment, far_weight far away
+        points = np.vstack((x, probes))
+        weight = np.ones(len(points))
+        if focus is not None:
+            log_s0, log_h0 = np.log(focus[0]), np.log(focus[1])
+            dh = np.clip(points[:, 1], log_h0 - np.log(2), log_h0) - points[:, 1]
+            distance = np.hypot(points[:, 0] - log_s0, dh)
+            weight = far_weight + (1 - far_weight) * np.exp(-(distance / focus_width)**2)
+
+        selected = _farthest_points(x, min(initial, len(x)))
+        while True:
+            interpolator = RBFInterpolator(x[selected], y[selected], **settings)
+            error = np.abs(np.expm1(interpolator(points) - np.vstack((y, reference))))
+            weighted = error.max(axis=1) * weight
+
+            # Score of every unselected row: its own error, or that of a probe it is the nearest unselected row to
+            score = weighted[:len(x)].copy()
+            free = np.ones(len(x), dtype=bool)
+            free[selected] = False
+            score[selected] = 0
+            candidate = free[nearest]
+            has_candidate = candidate.any(axis=1)
+            owner = nearest[has_candidate, np.argmax(candidate[has_candidate], axis=1)]
+            np.maximum.at(score, owner, weighted[len(x):][has_candidate])
+
+            worst = np.argsort(score)[::-1]
+            worst = worst[score[worst] > tol]
+            room = max_centers - len(selected)
+            if worst.size == 0 or room <= 0:
+                break
+            selected = np.sort(np.concatenate((selected, worst[:min(room, max(1, int(growth * len(selected))))])))
+
+    max_error = error.max(axis=0)
+    if entry is not None:
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            with open(entry + '.json', 'w') as file:
+                json.dump({'centers': selected.tolist(), 'max_error': max_error.tolist(), 'options': options}, file)
+        except OSError:
+            pass
+    return selected, max_error
+
+
+def _farthest_points(x, count):
+    # Space-filling seed: repeatedly take the row farthest from those already taken (in normalized coordinates)
+    scaled = (x - x.min(axis=0)) / np.maximum(np.ptp(x, axis=0), np.finfo(float).tiny)
+    chosen = [int(np.argmin(scaled.sum(axis=1)))]
+    distance = np.linalg.norm(scaled - scaled[chosen[0]], axis=1)
+    for _ in range(count - 1):
+        chosen.append(int(np.argmax(distance)))
+        distance = np.minimum(distance, np.linalg.norm(scaled - scaled[chosen[-1]], axis=1))
+    return np.unique(chosen)
+
+
+def load_surrogate_settings(path=SURROGATE_CONFIG):
+    """
+    Returns the RBFInterpolator settings saved by tune_surrogate.py, or DEFAULT_RBF_SETTINGS if there are none.
     """
-    # Prepare the data for RBF interpolation of density
-    x = np.log(np.vstack((Entropy, Enthalpy))).T  # Input data: log of Entropy and Enthalpy
+    try:
+        with open(os.path.abspath(path)) as file:
+            settings = json.load(file)['settings']
+    except (OSError, ValueError, KeyError):
+        return dict(DEFAULT_RBF_SETTINGS)
+    return {name: settings[name] for name in RBF_SETTINGS if settings.get(name) is not None}
 
-    y_rho = np.log(rho)  # Log of density
-    rbf_interpolator_rho = RBFInterpolator(x, y_rho, kernel='quintic')
 
-    # Prepare the data for RBF interpolation of speed of sound
-    y_speed_of_sound = np.log(speed_of_sound)  # Log of speed of sound
-    rbf_interpolator_speed = RBFInterpolator(x, y_speed_of_sound, kernel='quintic')
+def construct_rbf_interpolators(Enthalpy, Entropy, rho, speed_of_sound, Pressure, Temperature,
+                                kernel=None, cache_dir=CACHE_DIR):
+    """
+    Constructs RBF interpolators for density and speed of sound based on Enthalpy and Entropy.
 
-    # Prepare the data for RBF interpolation of temperature
-    y_temperature = np.log(Temperature)
-    rbf_interpolator_temperature = RBFInterpolator(x, y_temperature, kernel='quintic')
+    Kept for callers that expect one interpolator per property: all four share a single
+    multi-output fit (see ThermoSurrogate). Fitted interpolators are stored in 'cache_dir' and
+    reloaded (memory-mapped) on later runs; the cache is keyed by a hash of the table contents
+    and the kernel settings, so a changed table or kernel is refitted automatically.
+    """
+    df = pd.DataFrame({'Enthalpy': Enthalpy, 'Entropy': Entropy, 'rho': rho, 'SpeedOfSound': speed_of_sound,
+                       'p': Pressure, 'T': Temperature})
+    surrogate = construct_thermo_surrogate(df, kernel=kernel, cache_dir=cache_dir)
 
-    # Prepare the data for RBF interpolation of pressure
-    y_pressure = np.log(Pressure)
-    rbf_interpolator_pressure = RBFInterpolator(x, y_pressure, kernel='quintic')
+    rbf_interpolator_rho = surrogate.column('rho')
+    rbf_interpolator_speed = surrogate.column('SpeedOfSound')
+    rbf_interpolator_pressure = surrogate.column('p')
+    rbf_interpolator_temperature = surrogate.column('T')
 
     return rbf_interpolator_rho, rbf_interpolator_speed, rbf_interpolator_pressure, rbf_interpolator_temperature
 
 
+def fit_rbf_cached(x, y, cache_dir=CACHE_DIR, **settings):
+    """
+    Fits an RBFInterpolator, reusing a previously cached fit when one exists.
+
+    Args:
+    - x: (N, ndim) array of data point coordinates.
+    - y: (N,) or (N, k) array of data values.
+    - cache_dir: Directory holding cached fits, or None to disable caching.
+    - settings: Keyword arguments passed on to RBFInterpolator (kernel, epsilon, smoothing, degree).
+
+    Returns:
+    - A fitted RBFInterpolator. Arrays loaded from the cache are read-only memory maps.
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+
+    # Local (neighbors) interpolators solve small systems at query time, so there is nothing to cache
+    if cache_dir is None or settings.get('neighbors') is not None:
+        with instrument.stage('fit_surrogate'):
+            return RBFInterpolator(x, y, **settings)
+
+    entry = os.path.join(os.path.abspath(cache_dir), 'rbf_' + _rbf_cache_key(x, y, settings))
+    if os.path.isdir(entry):
+        try:
+            with instrument.stage('load_surrogate'):
+                return _load_rbf(entry)
+        except (OSError, ValueError, KeyError):
+            shutil.rmtree(entry, ignore_errors=True)  # Corrupt or stale entry, refit below
+
+    with instrument.stage('fit_surrogate'):
+        interpolator = RBFInterpolator(x, y, **settings)
+    _save_rbf(entry, interpolator)
+    return interpolator
+
+
+def _rbf_cache_key(x, y, settings):
+    # Content hash of the fitted data plus everything that changes the solution
+    digest = hashlib.sha256()
+    for array in (x, y):
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    digest.update(json.dumps(sorted(settings.items()), default=str).encode())
+    digest.update(f'{CACHE_VERSION}-{scipy.__version__}'.encode())
+    return digest.hexdigest()[:32]
+
+
+def export_surrogate(surrogate):
+    """
+    Splits a fitted surrogate into NumPy arrays and a small JSON-serialisable metadata dictionary.
+
+    The arrays can be stored or placed in shared memory; import_surrogate rebuilds the surrogate
+    from them without refitting.
+    """
+    if isinstance(surrogate, TabulatedThermo):
+        arrays = {'log_s': surrogate.log_s, 'log_h': surrogate.log_h, 'values': surrogate.values}
+        meta = {'kind': 'table', 'max_deviation': surrogate.max_deviation}
+    else:
+        arrays, meta = _rbf_arrays(surrogate.interpolator)
+        meta['kind'] = 'rbf'
+        meta['max_error'] = surrogate.max_error
+    meta['properties'] = list(surrogate.properties)
+    return arrays, meta
+
+
+def import_surrogate(arrays, meta):
+    """
+    Rebuilds a surrogate from the output of export_surrogate. The arrays are used without copying.
+    """
+    if meta['kind'] == 'table':
+        return TabulatedThermo(arrays['log_s'], arrays['log_h'], arrays['values'], meta['properties'],
+                               meta['max_deviation'])
+    return ThermoSurrogate(_rbf_from_arrays(arrays, meta), meta['properties'], meta.get('max_error'))
+
+
+def _save_rbf(entry, interpolator):
+    arrays, meta = _rbf_arrays(interpolator)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+    # Write into a temporary directory first so that readers never see a partial entry
+    staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, name + '.npy'), np.asarray(array))
+        with open(os.path.join(staging, 'meta.json'), 'w') as file:
+            json.dump(meta, file)
+        os.replace(staging, entry)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # Caching is best effort (e.g. another process won)
+
+
+def _load_rbf(entry):
+    with open(os.path.join(entry, 'meta.json')) as file:
+        meta = json.load(file)
+    arrays = {name: np.load(os.path.join(entry, name + '.npy'), mmap_mode='r') for name in RBF_ARRAYS}
+    return _rbf_from_arrays(arrays, meta)
+
+
+def _rbf_arrays(interpolator):
+    if interpolator.neighbors is not None:
+        # Local interpolators keep no solved coefficients; importing rebuilds the (cheap) KD-tree
+        arrays = {'y': interpolator.y, 'd': interpolator.d, 'smoothing': interpolator.smoothing}
+        meta = {'kernel': interpolator.kernel, 'epsilon': interpolator.epsilon, 'neighbors': interpolator.neighbors,
+                'degree': int(interpolator.powers.sum(axis=1).max(initial=-1))}
+        return arrays, meta
+    arrays = {'y': interpolator.y, 'd': interpolator.d, 'smoothing': interpolator.smoothing,
+              'powers': interpolator.powers, 'shift': interpolator._shift, 'scale': interpolator._scale,
+              'coeffs': interpolator._coeffs}
+    meta = {'d_shape': list(interpolator.d_shape), 'd_dtype': np.dtype(interpolator.d_dtype).str,
+            'kernel': interpolator.kernel, 'epsilon': interpolator.epsilon, 'scipy': scipy.__version__}
+    return arrays, meta
+
 
+def _rbf_from_arrays(arrays, meta):
+    # Rebuilds a fitted RBFInterpolator without solving the linear system again.
+    # The state layout is the one used by RBFInterpolator.__getstate__ in recent SciPy releases.
+    if meta.get('neighbors') is not None:
+        return RBFInterpolator(arrays['y'], arrays['d'], neighbors=meta['neighbors'], smoothing=arrays['smoothing'],
+                               kernel=meta['kernel'], epsilon=meta['epsilon'], degree=meta['degree'])
+    state = ((arrays['y'], arrays['d'], tuple(meta['d_shape']), np.dtype(meta['d_dtype']), None,
+              arrays['smoothing'], meta['kernel'], meta['epsilon'], arrays['powers']),
+             (arrays['shift'], arrays['scale'], arrays['coeffs']))
+    interpolator = RBFInterpolator.__new__(RBFInterpolator)
+    if hasattr(RBFInterpolator, '__setstate__'):
+        interpolator.__setstate__(state)
+    else:
+        (interpolator.y, interpolator.d, interpolator.d_shape, interpolator.d_dtype, interpolator.neighbors,
+         interpolator.smoothing, interpolator.kernel, interpolator.epsilon, interpolator.powers) = state[0]
+        interpolator._shift, interpolator._scale, interpolator._coeffs = state[1]
+    return interpolator
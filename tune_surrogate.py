@@ -0,0 +1,161 @@
+"""
+Accuracy/speed tuning of the thermodynamic surrogate.
+
+Every combination of kernel, smoothing, polynomial degree and neighbour count is cross-validated
+on held-out rows of the thermodynamic table. The fastest configuration (query time) whose worst
+fractional error stays within the error budget is saved to data/surrogate_config.json, which
+thermo.construct_thermo_surrogate then uses.
+
+    python tune_surrogate.py --budget 1e-3
+    python tune_surrogate.py --kernels quintic cubic --neighbors 0 64 --folds 3 --no-save
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+
+from thermo import load_thermodynamic_data, SURROGATE_CONFIG, THERMO_PROPERTIES
+
+KERNELS = ('quintic', 'cubic', 'thin_plate_spline', 'linear')
+SMOOTHING = (0.0, 1e-8, 1e-5)
+DEGREES = (-1, 0, 2)  # -1 selects the smallest degree the kernel allows
+NEIGHBORS = (0, 128)  # 0 is a global fit over every data point
+QUERY_BATCH = 500  # Points per timed query, the batch size of one indirect-method evaluation
+
+# Smallest polynomial degree of each kernel (conditionally positive definite kernels need it)
+MIN_DEGREE = {'quintic': 2, 'cubic': 1, 'thin_plate_spline': 1, 'linear': 0}
+
+
+def configurations(kernels=KERNELS, smoothing=SMOOTHING, degrees=DEGREES, neighbors=NEIGHBORS):
+    """
+    All distinct RBFInterpolator settings of the given options (degrees below a kernel's minimum are skipped).
+    """
+    seen = set()
+    for kernel, value, degree, count in itertools.product(kernels, smoothing, degrees, neighbors):
+        degree = MIN_DEGREE.get(kernel, 0) if degree < 0 else degree
+        if degree < MIN_DEGREE.get(kernel, 0):
+            continue
+        key = (kernel, float(value), degree, count or None)
+        if key not in seen:
+            seen.add(key)
+            yield {'kernel': kernel, 'smoothing': float(value), 'degree': degree, 'neighbors': count or None}
+
+
+def cross_validate(x, y, settings, folds, rng_seed=0, max_folds=None):
+    """
+    K-fold cross-validation of one configuration.
+
+    Args:
+    - x: (N, 2) log inputs.
+    - y: (N, k) log property values.
+    - settings: RBFInterpolator keyword arguments.
+    - folds: Number of folds.
+    - max_folds: Evaluate only the first max_folds folds (None for all).
+
+    Returns:
+    - Dictionary of fit time, query time, memory (size of the kernel system and of the fitted arrays) and
+      fractional errors (per property, in physical space).
+    """
+    order = np.random.default_rng(rng_seed).permutation(len(x))
+    parts = np.array_split(order, folds)[:max_folds]
+    fit_times, query_times, errors = [], [], []
+    for held_out in parts:
+        train = np.setdiff1d(order, held_out)
+
+        start = time.perf_counter()
+        interpolator = RBFInterpolator(x[train], y[train], **settings)
+        fit_times.append(time.perf_counter() - start)
+        model_bytes = sum(value.nbytes for value in vars(interpolator).values() if isinstance(value, np.ndarray))
+
+        predicted = interpolator(x[held_out])
+        errors.append(np.abs(np.expm1(predicted - y[held_out])))  # Fractional error of exp(log value)
+
+        batch = x[held_out[:QUERY_BATCH]]
+        start = time.perf_counter()
+        interpolator(batch)
+        query_times.append((time.perf_counter() - start) / len(batch))
+
+    # Dense kernel system solved by the fit (global) or for every query point (local)
+    size = (settings['neighbors'] or len(train)) + len(interpolator.powers)
+    errors = np.concatenate(errors)
+    return {'fit_seconds': float(np.mean(fit_times)),
+            'query_us_per_point': float(np.min(query_times)) * 1e6,
+            'system_mb': size**2 * 8 / 2**20,
+            'model_mb': model_bytes / 2**20,
+            'max_error': float(errors.max()),
+            'mean_error': float(errors.mean()),
+            'max_error_by_property': errors.max(axis=0).tolist(),
+            'mean_error_by_property': errors.mean(axis=0).tolist()}
+
+
+def choose(results, budget):
+    """
+    The fastest configuration (query time, then fit time) whose max_error is within the budget, or None.
+    """
+    feasible = [result for result in results if result['max_error'] <= budget]
+    if not feasible:
+        return None
+    return min(feasible, key=lambda result: (result['query_us_per_point'], result['fit_seconds']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate thermodynamic surrogate settings.')
+    parser.add_argument('--thermo', default='data/output.dat', help='Thermodynamic table')
+    parser.add_argument('--budget', type=float, default=1e-3, help='Largest allowed fractional error')
+    parser.add_argument('--folds', type=int, default=5, help='Number of cross-validation folds')
+    parser.add_argument('--max-folds', type=int, default=None, help='Only evaluate this many of the folds')
+    parser.add_argument('--kernels', nargs='+', default=list(KERNELS))
+    parser.add_argument('--smoothing', type=float, nargs='+', default=list(SMOOTHING))
+    parser.add_argument('--degrees', type=int, nargs='+', default=list(DEGREES),
+                        help='Polynomial degrees (-1 for the kernel minimum)')
+    parser.add_argument('--neighbors', type=int, nargs='+', default=list(NEIGHBORS),
+                        help='Neighbour counts (0 for a global fit)')
+    parser.add_argument('--config', default=SURROGATE_CONFIG, help='Where to save the chosen configuration')
+    parser.add_argument('--results', help='Also write every result to this JSON file')
+    parser.add_argument('--no-save', action='store_true', help='Only report, do not save the configuration')
+    args = parser.parse_args(argv)
+
+    df = load_thermodynamic_data(os.path.abspath(args.thermo))[0]
+    x = np.log(np.column_stack((df['Entropy'].values, df['Enthalpy'].values)))
+    y = np.log(np.column_stack([df[name].values for name in THERMO_PROPERTIES]))
+
+    results = []
+    print(f'{"kernel":<18}{"smoothing":>10}{"degree":>7}{"neighbors":>10}{"fit (s)":>10}{"query (us)":>11}'
+          f'{"system (MB)":>13}{"model (MB)":>12}{"max err":>10}{"mean err":>10}')
+    for settings in configurations(args.kernels, args.smoothing, args.degrees, args.neighbors):
+        try:
+            metrics = cross_validate(x, y, settings, args.folds, max_folds=args.max_folds)
+        except (ValueError, np.linalg.LinAlgError) as error:
+            print(f'{settings}: failed ({error})')
+            continue
+        results.append({'settings': settings, **metrics})
+        print(f'{settings["kernel"]:<18}{settings["smoothing"]:>10.0e}{settings["degree"]:>7}'
+              f'{settings["neighbors"] or "all":>10}{metrics["fit_seconds"]:>10.2f}'
+              f'{metrics["query_us_per_point"]:>11.2f}{metrics["system_mb"]:>13.1f}{metrics["model_mb"]:>12.2f}'
+              f'{metrics["max_error"]:>10.2e}{metrics["mean_error"]:>10.2e}')
+
+    if args.results:
+        with open(args.results, 'w') as file:
+            json.dump({'properties': list(THERMO_PROPERTIES), 'results': results}, file, indent=1)
+
+    best = choose(results, args.budget)
+    if best is None:
+        print(f'No configuration meets the error budget {args.budget:g}; nothing saved.')
+        return
+    print(f'Chosen: {best["settings"]} (max error {best["max_error"]:.2e}, '
+          f'{best["query_us_per_point"]:.2f} us per point)')
+    if not args.no_save:
+        config = dict(best, budget=args.budget, folds=args.folds, rows=len(df),
+                      properties=list(THERMO_PROPERTIES), created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(args.config, 'w') as file:
+            json.dump(config, file, indent=1)
+        print(f'Saved -> {args.config}')
+
+
+if __name__ == '__main__':
+    main()
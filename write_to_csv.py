@@ -1,5 +1,14 @@
 import csv
+import heapq
 import os
+import tempfile
+
+import numpy as np
+
+import instrument
+
+CHUNK_ROWS = 1 << 16  # Rows formatted per block by write_columns
+SORT_CHUNK_ROWS = 1 << 20  # Rows held in memory per sorted run by sort
 
 
 def write_to_csv(filename, data, headers):
@@ -11,16 +20,109 @@ def write_to_csv(filename, data, headers):
             writer.writerow(data[i])
 
 
-def sort(filename, header):
-    path_name = os.path.abspath(filename)
-    with open(path_name, 'r') as file:
-        reader = csv.reader(file)
-        header = next(reader)  # Read the header row
-        sorted_rows = sorted(reader, key=lambda row: row[0])  # Sort by the first column
+def write_columns(filename, columns, headers, chunk_rows=CHUNK_ROWS):
+    """
+    Writes equal-length arrays as the columns of a tab separated table.
 
-    filename = 'data/sorted.dat'
-    path_name = os.path.abspath(filename)
-    with open(path_name, 'w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(header)
-        writer.writerows(sorted_rows)
\ No newline at end of file
+    The output is identical to write_to_csv(filename, list(zip(*columns)), headers), but no
+    per-row tuples are built: each block of rows is converted column by column and written
+    with a single join.
+
+    Args:
+    - filename: Output file.
+    - columns: Sequence of 1D arrays, one per column.
+    - headers: Column titles.
+    - chunk_rows: Number of rows formatted at a time (bounds the memory of the text buffer).
+    """
+    columns = [np.asarray(column) for column in columns]
+    rows = len(columns[0]) if columns else 0
+    if any(column.shape != (rows,) for column in columns):
+        raise ValueError('columns must be 1D arrays of equal length')
+
+    with instrument.stage('write_text'), open(os.path.abspath(filename), 'w', newline='') as csvfile:
+        csv.writer(csvfile, delimiter='\t', quoting=csv.QUOTE_MINIMAL).writerow(headers)
+        for start in range(0, rows, chunk_rows):
+            # tolist() yields Python floats/ints, whose str() is what csv.writer writes
+            text = [list(map(str, column[start:start + chunk_rows].tolist())) for column in columns]
+            csvfile.write('\r\n'.join(map('\t'.join, zip(*text))))
+            csvfile.write('\r\n')
+
+
+def write_binary(target, columns, headers):
+    """
+    Writes equal-length arrays as a binary columnar table: a directory with one .npy file per
+    column and a schema.json (the layout of the binary_table caches). Much faster to write and
+    read than text; open it again with read_binary.
+
+    Args:
+    - target: Output directory.
+    - columns: Sequence of 1D arrays, one per column.
+    - headers: Column titles (stored as the column names).
+    """
+    from binary_table import write_columns as write_binary_columns
+    if len(set(headers)) != len(headers):
+        raise ValueError('column titles must be unique')
+    with instrument.stage('write_binary'):
+        write_binary_columns(target, dict(zip(headers, columns)))
+
+
+def read_binary(target):
+    """
+    Opens a table written by write_binary as a DataFrame of memory-mapped columns.
+    """
+    from binary_table import read_columns
+    return read_columns(target)
+
+
+def sort(filename, header=None, output='data/sorted.dat', column=0, delimiter='\t', chunk_rows=SORT_CHUNK_ROWS):
+    """
+    Sorts the rows of a delimited table by the numeric value of one column.
+
+    Rows are read in runs of 'chunk_rows', each run is sorted in memory and spilled to a
+    temporary file, and the runs are merged while streaming to the output, so tables larger
+    than memory can be sorted. The sort is stable and the row text is copied unchanged.
+
+    Args:
+    - filename: Table to sort (first line is the header).
+    - header: Header row of the output, or None to keep the input's header.
+    - output: Sorted table.
+    - column: Index of the key column.
+    - delimiter: Field delimiter.
+    - chunk_rows: Rows held in memory at a time.
+    """
+    def key(line):
+        return float(line.split(delimiter, column + 1)[column])
+
+    runs = []
+    with open(os.path.abspath(filename), 'r', newline='') as file, tempfile.TemporaryDirectory() as scratch:
+        header_line = file.readline()
+        if header is not None:
+            header_line = delimiter.join(header) + '\r\n'
+
+        while True:
+            lines = [line for _, line in zip(range(chunk_rows), file)]
+            if not lines:
+                break
+            if not lines[-1].endswith('\n'):
+                lines[-1] += '\r\n'
+            keys = np.array([key(line) for line in lines])
+            lines = [lines[i] for i in np.argsort(keys, kind='stable')]
+            if len(lines) < chunk_rows and not runs:
+                runs.append(lines)  # Everything fits in one run, no need to spill it
+                break
+            path = os.path.join(scratch, f'run_{len(runs)}.dat')
+            with open(path, 'w', newline='') as run:
+                run.writelines(lines)
+            runs.append(path)
+
+        files = [open(run, 'r', newline='') for run in runs if isinstance(run, str)]
+        try:
+            with open(os.path.abspath(output), 'w', newline='') as out:
+                out.write(header_line)
+                if len(runs) == 1 and not files:
+                    out.writelines(runs[0])
+                else:
+                    out.writelines(heapq.merge(*files, key=key))  # Ties keep the run (input) order
+        finally:
+            for run in files:
+                run.close()